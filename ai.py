@@ -1,10 +1,18 @@
-from typing import Union
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from os import cpu_count
+from typing import Dict, List, Tuple, Union
 
 import gym
+import numpy as np
 from stable_baselines3.common.policies import ActorCriticPolicy
+from stable_baselines3.common.vec_env import VecEnv
 from stable_baselines3 import A2C, PPO
-from punto import Game, Card
+from punto import Board, Game, Card
 from random import choice
+from time import perf_counter
+from vecsim import BatchSimulator
 
 players = ["StockMind", "DeepFish", "LeelaPunto0", "AlphaMinus1"]
 
@@ -66,6 +74,283 @@ class PuntoEnv(gym.Env):
         return str(self.game)
 
 
+def buffer_specs(n_envs: int) -> Dict[str, Tuple[Tuple[int, ...], type]]:
+    """
+    :return: shape and dtype of every array a PuntoVecEnv writes its results to
+    """
+    fields = Board.max_x * Board.max_y
+    return {
+        "obs": ((n_envs, fields + 1), np.int64),
+        "terminal_obs": ((n_envs, fields + 1), np.int64),
+        "masks": ((n_envs, fields), np.bool_),
+        "rewards": ((n_envs,), np.float32),
+        "dones": ((n_envs,), np.bool_),
+        "actions": ((n_envs,), np.int64),
+    }
+
+
+class _PuntoVecEnvBase(VecEnv):
+    """
+    spaces and attribute access of PuntoVecEnv and SharedMemoryVecEnv, all games are stepped by one object
+    -> attributes and methods are the same for every index
+    """
+
+    def __init__(self, n_envs: int, n_players: int):
+        fields = Board.max_x * Board.max_y
+        combinations_per_field = n_players * (Card.max_val + 1)
+        board_encoded = [combinations_per_field] * fields
+        board_encoded.append(Card.max_val + 1)  # add own top card to obs space
+        super().__init__(n_envs, gym.spaces.MultiDiscrete(board_encoded), gym.spaces.Discrete(fields))
+
+    def get_attr(self, attr_name: str, indices=None) -> list:
+        return [getattr(self, attr_name)] * len(self._indices(indices))
+
+    def set_attr(self, attr_name: str, value, indices=None) -> None:
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> list:
+        return [getattr(self, method_name)(*method_args, **method_kwargs)] * len(self._indices(indices))
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> List[bool]:
+        return [False] * len(self._indices(indices))
+
+    def _indices(self, indices) -> List[int]:
+        if indices is None:
+            return list(range(self.num_envs))
+        return [indices] if isinstance(indices, int) else list(indices)
+
+
+class PuntoVecEnv(_PuntoVecEnvBase):
+    """
+    n_envs games stepped at once on a BatchSimulator, every step plays the card of the current player of each game
+    observations are written in place into one preallocated array (board as in Board.get_observation + card to play),
+    it is overwritten by the next step
+    actions are spot indices (y * max_x + x), action_masks returns the valid ones (e.g. for sb3-contrib MaskablePPO)
+    reward: 1 for a winning play, -1 for an invalid play (the card is discarded), 0 else
+    finished games are reset automatically, their last observation is in info["terminal_observation"]
+    """
+
+    def __init__(self, n_envs: int = 64, n_players: int = len(players), seed: int = None,
+                 buffers: Dict[str, np.ndarray] = None):
+        """
+        :param buffers: arrays to write the results to (see buffer_specs), e.g. views of shared memory, new if None
+        """
+        self.sim = BatchSimulator(n_envs, n_players, seed)
+        super().__init__(n_envs, n_players)
+
+        if buffers is None:
+            buffers = {name: np.zeros(shape, dtype) for name, (shape, dtype) in buffer_specs(n_envs).items()}
+        self._obs = buffers["obs"]
+        self._terminal_obs = buffers["terminal_obs"]
+        self._masks = buffers["masks"]
+        self._rewards = buffers["rewards"]
+        self._dones = buffers["dones"]
+        self._actions = buffers["actions"]
+        self._valid = np.zeros((n_envs, Board.max_y, Board.max_x), dtype=bool)
+        self._rows = np.arange(n_envs)
+
+    def reset(self) -> np.ndarray:
+        self.sim.reset()
+        self._write_boards(self._rows)
+        self._update_next_cards()
+        return self._obs
+
+    def action_masks(self) -> np.ndarray:
+        return self._masks
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._actions[:] = actions
+
+    def step_wait(self) -> (np.ndarray, np.ndarray, np.ndarray, List[dict]):
+        actions = self._actions
+        x = actions % Board.max_x
+        y = actions // Board.max_x
+        ids, values = self.sim.current_cards()
+        running = ~self.sim.done
+
+        # invalid plays are discarded, no penalty if there was no valid play at all
+        valid_action = self._masks[self._rows, actions]
+        self._rewards[:] = np.where(valid_action | ~self._masks.any(axis=1), 0, -1)
+        won = self.sim.step(x, y, self._valid & valid_action[:, None, None])
+        self._rewards[won > 0] = 1
+
+        # only the played spots changed (see Board.update_observation)
+        played = self._rows[running & valid_action]
+        self._obs[played, actions[played]] = ids[played] * values[played]
+
+        self._dones[:] = self.sim.done
+        if self._dones.any():
+            finished = self._rows[self._dones]
+            self._terminal_obs[finished] = self._obs[finished]
+            self.sim.reset(self._dones)
+            self._write_boards(finished)
+        self._update_next_cards()
+        return self._obs, self._rewards, self._dones, terminal_infos(self._dones, self._terminal_obs)
+
+    def get_buffers(self) -> Dict[str, np.ndarray]:
+        return {
+            "obs": self._obs, "terminal_obs": self._terminal_obs, "masks": self._masks,
+            "rewards": self._rewards, "dones": self._dones, "actions": self._actions,
+        }
+
+    def _write_boards(self, rows: np.ndarray) -> None:
+        self._obs[rows, :-1] = (self.sim.owner[rows] * self.sim.value[rows]).reshape(len(rows), -1)
+
+    def _update_next_cards(self) -> None:
+        _, values = self.sim.current_cards()
+        self._obs[:, -1] = values
+        self._valid[:] = self.sim.valid_mask()
+        self._masks[:] = self._valid.reshape(self.num_envs, -1)
+
+    def close(self) -> None:
+        pass
+
+    def seed(self, seed: int = None) -> List[int]:
+        self.sim.rng = np.random.default_rng(seed)
+        return [seed] * self.num_envs
+
+
+def terminal_infos(dones: np.ndarray, terminal_obs: np.ndarray) -> List[dict]:
+    infos = [{} for _ in range(len(dones))]
+    for i in dones.nonzero()[0]:
+        infos[i]["terminal_observation"] = terminal_obs[i].copy()
+    return infos
+
+
+def _shm_worker(conn: Connection, shm_name: str, n_envs: int, start: int, stop: int, n_players: int,
+                seed: int) -> None:
+    # steps the games start .. stop of a SharedMemoryVecEnv, results go straight into the shared memory
+    shm = SharedMemory(shm_name)
+    buffers = {name: array[start:stop] for name, array in _attach(shm, n_envs).items()}
+    env = PuntoVecEnv(stop - start, n_players, seed, buffers)
+    try:
+        while True:
+            cmd = conn.recv()
+            if cmd == "step":
+                env.step_wait()  # actions are already in the shared buffer
+            elif cmd == "reset":
+                env.reset()
+            elif cmd == "close":
+                break
+            conn.send(None)
+    finally:
+        del env, buffers
+        shm.close()
+
+
+def _attach(shm: SharedMemory, n_envs: int) -> Dict[str, np.ndarray]:
+    # all buffers of buffer_specs, one after the other in the shared memory block
+    arrays = {}
+    offset = 0
+    for name, (shape, dtype) in buffer_specs(n_envs).items():
+        arrays[name] = np.ndarray(shape, dtype, shm.buf, offset)
+        offset += arrays[name].nbytes
+    return arrays
+
+
+class SharedMemoryVecEnv(_PuntoVecEnvBase):
+    """
+    PuntoVecEnv split over worker processes, each worker steps a slice of the games and writes observations,
+    rewards, dones and action masks into one shared memory block, only short commands go through the pipes
+    the returned arrays are views of the shared memory (no copy), they are overwritten by the next step
+    close it when done, else the shared memory is not freed
+    """
+
+    def __init__(self, n_envs: int = 256, n_players: int = len(players), n_workers: int = None, seed: int = 0):
+        n_workers = min(n_workers or cpu_count() or 1, n_envs)
+        size = sum(np.dtype(dtype).itemsize * int(np.prod(shape)) for shape, dtype in buffer_specs(n_envs).values())
+        self._shm = SharedMemory(create=True, size=size)
+        self._buffers = _attach(self._shm, n_envs)
+        super().__init__(n_envs, n_players)
+
+        bounds = np.linspace(0, n_envs, n_workers + 1).astype(int)
+        self._conns = []
+        self._workers = []
+        for i, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:])):
+            conn, worker_conn = Pipe()
+            worker = Process(target=_shm_worker, args=(worker_conn, self._shm.name, n_envs, start, stop, n_players,
+                                                       seed + i), daemon=True)
+            worker.start()
+            self._conns.append(conn)
+            self._workers.append(worker)
+
+    def _send(self, cmd: str) -> None:
+        for conn in self._conns:
+            conn.send(cmd)
+        for conn in self._conns:
+            conn.recv()
+
+    def reset(self) -> np.ndarray:
+        self._send("reset")
+        return self._buffers["obs"]
+
+    def action_masks(self) -> np.ndarray:
+        return self._buffers["masks"]
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._buffers["actions"][:] = actions
+        for conn in self._conns:
+            conn.send("step")
+
+    def step_wait(self) -> (np.ndarray, np.ndarray, np.ndarray, List[dict]):
+        for conn in self._conns:
+            conn.recv()
+        dones = self._buffers["dones"]
+        return (self._buffers["obs"], self._buffers["rewards"], dones,
+                terminal_infos(dones, self._buffers["terminal_obs"]))
+
+    def close(self) -> None:
+        if not self._workers:
+            return
+        for conn in self._conns:
+            conn.send("close")
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        self._buffers = {}
+        self._shm.close()
+        self._shm.unlink()
+
+    def seed(self, seed: int = None) -> List[int]:
+        return [seed] * self.num_envs
+
+
+def _vec_env_rate(vec_env: VecEnv, steps: int) -> float:
+    # env steps per second with random valid actions
+    rng = np.random.default_rng(0)
+    vec_env.reset()
+    start = perf_counter()
+    for _ in range(steps):
+        masks = vec_env.action_masks()
+        vec_env.step((rng.random(masks.shape) * masks).argmax(axis=1))
+    return vec_env.num_envs * steps / (perf_counter() - start)
+
+
+def benchmark_rollouts(n_envs: int = 256, steps: int = 200) -> (float, float, float):
+    """
+    :return: env steps per second with random valid actions of PuntoVecEnv, SharedMemoryVecEnv and PuntoEnv
+    """
+    vec_rate = _vec_env_rate(PuntoVecEnv(n_envs, seed=0), steps)
+    shm_env = SharedMemoryVecEnv(n_envs, seed=0)
+    try:
+        shm_rate = _vec_env_rate(shm_env, steps)
+    finally:
+        shm_env.close()
+
+    env = PuntoEnv()
+    env.reset()
+    env.set_check_valid(True)
+    start = perf_counter()
+    for _ in range(steps):
+        card = env.game.players[0].peek_next_card()
+        actions = env.game.board.get_valid_plays(card)
+        _, _, done, _ = env.step(choice(actions) if actions else (0, 0))
+        env.game.next_player()
+        if done:
+            env.reset()
+    return vec_rate, shm_rate, steps / (perf_counter() - start)
+
+
 def main():
     env = PuntoEnv()
     a2c = A2C(ActorCriticPolicy, env, n_steps=64, verbose=0)
@@ -99,7 +384,7 @@ def main():
         while not done:
             board_obs = env.game.board.get_observation()
             card = env.game.players[0].peek_next_card()
-            obs = board_obs.append(card)
+            obs = board_obs + [card.value]
 
             # actions = env.game.board.get_valid_plays(card)
             action, _ = agent.predict(obs)  # , mask=actions)
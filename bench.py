@@ -0,0 +1,201 @@
+from argparse import ArgumentParser
+from engine import GreedyAgent, OpeningAgent, play_game
+from heuristic import TranspositionTable, get_best_spots, maximax
+from json import dump, load
+from mcts import MCTS
+from platform import platform, python_version
+from punto import Card, Game
+from random import Random
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+from vecsim import BatchSimulator
+
+NAMES = ["StockMind", "DeepFish", "LeelaPunto0", "AlphaMinus1"]
+
+# fixed positions to measure on: (players, seed, random plays before the position)
+CORPUS = [(players, seed, plays) for players in (2, 3, 4) for seed, plays in [(1, 4), (2, 10), (3, 16)]]
+
+RESULTS_PATH = "bench_results.json"
+BASELINE_PATH = "bench_baseline.json"
+
+# result: value and if a higher value is better
+Result = Dict[str, object]
+
+
+def corpus_position(nr_of_players: int, seed: int, nr_of_plays: int) -> Tuple[Game, Card]:
+    """
+    :return: game after nr_of_plays random plays and the drawn card of the player to move (already rotated, like
+             in Game.do_turn), the same for the same arguments
+    """
+    rng = Random(seed)
+    game = Game(NAMES[:nr_of_players], rng=rng)
+    for _ in range(nr_of_plays):
+        card = game.players[0].get_next_card()
+        game.next_player()
+        plays = game.board.get_valid_plays(card)
+        if plays:
+            game.board.play_card(card, *rng.choice(plays), False)
+    card = game.players[0].get_next_card()
+    game.next_player()
+    return game, card
+
+
+def _seconds_per_call(f: Callable[[], object], min_time: float) -> float:
+    # best of 3 runs, each run repeats f for at least min_time seconds
+    best = None
+    for _ in range(3):
+        calls = 0
+        start = perf_counter()
+        while True:
+            f()
+            calls += 1
+            elapsed = perf_counter() - start
+            if elapsed >= min_time:
+                break
+        if best is None or elapsed / calls < best:
+            best = elapsed / calls
+    return best
+
+
+def _corpus_mean(f: Callable[[Game, Card], object], min_time: float) -> float:
+    # mean seconds per call over all corpus positions
+    total = 0.0
+    for position in CORPUS:
+        game, card = corpus_position(*position)
+        total += _seconds_per_call(lambda: f(game, card), min_time)
+    return total / len(CORPUS)
+
+
+def _check_winner(game: Game, card: Card) -> None:
+    # check of every valid play of card
+    board = game.board
+    for x, y in board.get_valid_plays(card):
+        board.check_winner(card.player, x, y)
+
+
+def headless_game(nr_of_players: int, seed: int) -> int:
+    """
+    game without output: random plays in the first round, best spot of get_best_spots afterwards
+    :return: number of plays
+    """
+    rng = Random(seed)
+    agent = OpeningAgent(GreedyAgent(), book=False, rng=rng)
+    result = play_game(NAMES[:nr_of_players], [agent] * nr_of_players, rng)
+    return sum(turn.play is not None for turn in result.turns)
+
+
+def _games_per_sec(min_time: float) -> float:
+    games = 0
+    start = perf_counter()
+    while perf_counter() - start < min_time or games < 3:
+        nr_of_players, seed, _ = CORPUS[games % len(CORPUS)]
+        headless_game(nr_of_players, seed)
+        games += 1
+    return games / (perf_counter() - start)
+
+
+def _env_steps_per_sec(min_time: float, n_games: int = 256) -> float:
+    # steps of the batched simulator (what ai.PuntoVecEnv does per step), random valid plays
+    steps = 0
+    start = perf_counter()
+    for nr_of_players in (2, 3, 4):
+        sim = BatchSimulator(n_games, nr_of_players, seed=nr_of_players)
+        step_start = perf_counter()
+        while perf_counter() - step_start < min_time / 3:
+            valid = sim.valid_mask()
+            sim.step(*sim.random_actions(valid), valid)
+            sim.reset(sim.done)
+            steps += n_games
+    return steps / (perf_counter() - start)
+
+
+def _mcts_playouts_per_sec(min_time: float) -> float:
+    # random playouts with a new tree per corpus position, the goal of mcts.py is tens of thousands per second
+    total = 0.0
+    for position in CORPUS:
+        game, card = corpus_position(*position)
+        total += MCTS(seed=0).search(game, card, time_budget_ms=min_time * 1000).playouts_per_sec
+    return total / len(CORPUS)
+
+
+def run(min_time: float = 0.2) -> Dict[str, Result]:
+    """
+    :param min_time: seconds to repeat each measurement for (per corpus position)
+    :return: result per benchmark
+    """
+    per_call = {
+        "get_valid_plays_us": lambda game, card: game.board.get_valid_plays(card),
+        "check_winner_all_plays_us": _check_winner,
+        "get_best_spots_us": lambda game, card: get_best_spots(game.board, card),
+    }
+    results = {}
+    for name, f in per_call.items():
+        results[name] = {"value": _corpus_mean(f, min_time) * 1e6, "higher_is_better": False}
+
+    # one decision with an empty cache, no repetitions needed
+    total = 0.0
+    for position in CORPUS:
+        game, card = corpus_position(*position)
+        start = perf_counter()
+        maximax(game, card, TranspositionTable())
+        total += perf_counter() - start
+    results["maximax_ms"] = {"value": total / len(CORPUS) * 1e3, "higher_is_better": False}
+
+    results["headless_games_per_sec"] = {"value": _games_per_sec(min_time * 5), "higher_is_better": True}
+    results["env_steps_per_sec"] = {"value": _env_steps_per_sec(min_time * 5), "higher_is_better": True}
+    results["mcts_playouts_per_sec"] = {"value": _mcts_playouts_per_sec(min_time), "higher_is_better": True}
+    return results
+
+
+def compare(results: Dict[str, Result], baseline: Dict[str, Result], tolerance: float = 0.25) -> List[str]:
+    """
+    :param tolerance: allowed relative change to the worse
+    :return: description of every benchmark that is worse than the baseline by more than tolerance
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        value, base = result["value"], baseline[name]["value"]
+        change = (value - base) / base if base else 0.0
+        if result["higher_is_better"]:
+            change = -change
+        if change > tolerance:
+            regressions.append(f"{name}: {value:.4g} vs {base:.4g} in baseline ({change:+.0%} worse)")
+    return regressions
+
+
+def main():
+    parser = ArgumentParser(description="benchmarks of the hot paths on a fixed corpus of positions")
+    parser.add_argument("--out", default=RESULTS_PATH, help="json file to write the results to")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="json file with results to compare to")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to the baseline file too")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per measurement")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative change to the worse")
+    args = parser.parse_args()
+
+    results = run(args.min_time)
+    report = {"python": python_version(), "platform": platform(), "results": results}
+    for path in [args.out] + ([args.baseline] if args.save_baseline else []):
+        with open(path, "w") as f:
+            dump(report, f, indent=2)
+
+    for name, result in results.items():
+        print(f"[*] {name:<26} {result['value']:>12.2f}")
+
+    try:
+        with open(args.baseline) as f:
+            baseline = load(f)["results"]
+    except FileNotFoundError:
+        print(f"[*] No baseline at {args.baseline}")
+        return
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"[!] Regression {regression}")
+    if regressions:
+        exit(1)
+    print(f"[*] No regressions compared to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+from punto import Board, Card, Player
+from typing import Dict, List, Tuple
+
+# cells are stored row by row with one extra (always empty) guard column on the right,
+# so that shifting a mask left / right never wraps a card from one row into the next
+STRIDE = Board.max_x + 1
+SIZE = STRIDE * Board.max_y
+
+# shift per direction: left to right, top to bottom, top left to bottom right, top right to bottom left
+SHIFTS = (1, STRIDE, STRIDE + 1, STRIDE - 1)
+
+
+def to_index(x: int, y: int) -> int:
+    return y * STRIDE + x
+
+
+def from_index(i: int) -> Tuple[int, int]:
+    return i % STRIDE, i // STRIDE
+
+
+def _rect_mask(x_min: int, y_min: int, x_max: int, y_max: int) -> int:
+    row = ((1 << (x_max - x_min + 1)) - 1) << x_min
+    mask = 0
+    for y in range(y_min, y_max + 1):
+        mask |= row << (y * STRIDE)
+    return mask
+
+
+BOARD_MASK = _rect_mask(0, 0, Board.max_x - 1, Board.max_y - 1)
+
+# 3x3 block around each cell (the cell itself included, same as Board.is_valid_play)
+BLOCK_MASKS = [
+    _rect_mask(max(x - 1, 0), max(y - 1, 0), min(x + 1, Board.max_x - 1), min(y + 1, Board.max_y - 1))
+    if x < Board.max_x and y < Board.max_y else 0
+    for y in range(Board.max_y) for x in range(STRIDE)
+]
+
+# per direction and cell: all cells a run of 4 containing the cell could start at (0 to 3 steps before it)
+RUN_START_WINDOWS = [
+    [sum(1 << (i - k * d) for k in range(4) if i - k * d >= 0) for i in range(SIZE)]
+    for d in SHIFTS
+]
+
+
+def iter_bits(mask: int):
+    # yields the indices of all set bits, lowest (i.e. top left) first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class BitBoard(Board):
+    """
+    drop-in replacement for Board, stores one occupancy bitmask per player and per card value
+    plus a flat list of the placed cards, adjacency and four in a row checks are shift and mask operations
+    """
+
+    def __init__(self, card: Card):
+        self._cells = [self.null_card] * SIZE
+        self._player_masks: Dict[int, int] = {}
+        self._value_masks = [0] * (Card.max_val + 1)
+        self._occupied = 0
+        self._init_tracking()
+        self._init_borders()
+
+        self.played_cards = [card]
+        self._place(card, self.x_mid, self.y_mid)
+
+    def _place(self, card: Card, x: int, y: int) -> None:
+        i = to_index(x, y)
+        bit = 1 << i
+        old = self._cells[i]
+        self._track_change(old, card, x, y)
+        if old.value:
+            old_id = old.player_id
+            self._player_masks[old_id] &= ~bit
+            self._value_masks[old.value] &= ~bit
+        if card.value:
+            card_id = card.player_id
+            self._player_masks[card_id] = self._player_masks.get(card_id, 0) | bit
+            self._value_masks[card.value] |= bit
+            self._occupied |= bit
+        else:
+            self._occupied &= ~bit
+        self._cells[i] = card
+
+    def _update_frontier(self, old: Card, card: Card, x: int, y: int) -> None:
+        # not needed, the masks of _place give the frontier (see frontier_mask)
+        pass
+
+    def inner_mask(self) -> int:
+        return _rect_mask(self.ib_x_min, self.ib_y_min, self.ib_x_max, self.ib_y_max)
+
+    def frontier_mask(self) -> int:
+        # all empty cells next to at least one card
+        occ = self._occupied
+        grown = occ | (occ << 1) | (occ >> 1)
+        grown |= (grown << STRIDE) | (grown >> STRIDE)
+        return grown & BOARD_MASK & ~occ
+
+    def valid_mask(self, card: Card) -> int:
+        lower = 0
+        for v in range(Card.min_val, card.value):
+            lower |= self._value_masks[v]
+        return (self.frontier_mask() | lower) & self.inner_mask()
+
+    def get_card(self, x: int, y: int) -> Card:
+        return self._cells[to_index(x, y)]
+
+    def get_valid_plays(self, card: Card) -> List[Tuple[int, int]]:
+        return [from_index(i) for i in iter_bits(self.valid_mask(card))]
+
+    def is_valid_play(self, card: Card, x: int, y: int) -> bool:
+        i = to_index(x, y)
+        if card.value <= self._cells[i].value:
+            return False
+        if not self.ib_x_min <= x <= self.ib_x_max or not self.ib_y_min <= y <= self.ib_y_max:
+            return False
+        return bool(self._occupied & BLOCK_MASKS[i])
+
+    def play_card(self, card: Card, x: int, y: int, check_if_valid: bool = True) -> bool:
+        if check_if_valid and not self.is_valid_play(card, x, y):
+            return False
+        self.played_cards.append(card)
+        self._place(card, x, y)
+        self.update_borders(x, y)
+        return True
+
+    def set_card(self, card: Card, x: int, y: int) -> None:
+        # only change spot, no checks, no new card in "cards played", has to be reverted, used by heuristics
+        self._place(card, x, y)
+
+    def check_winner(self, last_player: Player, x: int, y: int) -> bool:
+        m = self._player_masks.get(last_player.get_player_id(), 0)
+        i = to_index(x, y)
+        for d, windows in zip(SHIFTS, RUN_START_WINDOWS):
+            # bit s is set in runs if s, s+d, s+2d and s+3d are all set
+            runs = m & (m >> d) & (m >> 2 * d) & (m >> 3 * d)
+            if runs & windows[i]:
+                return True
+        return False
+
+    def get_observation(self) -> List[int]:
+        obs = []
+        for y in range(self.max_y):
+            for card in self._cells[y * STRIDE:y * STRIDE + self.max_x]:
+                obs.append(card.player_id * card.value)
+        return obs
+
+    def reset(self, first_card: Card):
+        self._cells = [self.null_card] * SIZE
+        self._player_masks = {}
+        self._value_masks = [0] * (Card.max_val + 1)
+        self._occupied = 0
+        self._init_tracking()
+
+        # set up for next game
+        self._place(first_card, self.x_mid, self.y_mid)
+        self.played_cards = [first_card]
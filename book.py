@@ -0,0 +1,225 @@
+from argparse import ArgumentParser
+from array import array
+from hashlib import blake2b
+from os import path as os_path
+from punto import INVERSE_TRANSFORMS, Board, Card, Game, Player, get_cell_transforms, zobrist_key
+from search import best_move
+from struct import pack
+from sys import byteorder
+from time import perf_counter
+from typing import Dict, List, Tuple, Type
+
+DEFAULT_PATH = os_path.join(os_path.dirname(os_path.abspath(__file__)), "book.bin")
+
+# file layout: MAGIC, most cards played in a position of the book (uint8), number of entries (uint32),
+# keys (uint64 each, sorted), flat cell index of the play (uint8 each)
+MAGIC = b"PBK1"
+
+# (value, x, y) of the plays from the start of a game, the first one is in the middle
+Plays = List[Tuple[int, int, int]]
+
+
+def book_key(game: Game, player: Player, value: int) -> Tuple[int, int]:
+    """
+    64 bit key of a position and the card to play, the same for all rotations and mirrorings of the board and for
+    all seatings (players are numbered in order of play, starting with the player to move)
+    :param player: the player to move
+    :return: the key and the transform (see punto.TRANSFORMS) from this board to the orientation of the book
+    """
+    board = game.board
+    ids = [p.get_player_id() for p in game.players]
+    i = ids.index(player.get_player_id())
+    relative = {player_id: n + 1 for n, player_id in enumerate(ids[i:] + ids[:i])}
+
+    cells, borders, _ = board.snapshot()
+    occupied = [(cell, relative[code // 10], code % 10) for cell, code in enumerate(cells) if code]
+
+    best = None
+    for transform, moved in enumerate(get_cell_transforms(board.max_x)):
+        h = 0
+        for cell, player_id, card_value in occupied:
+            h ^= zobrist_key(moved[cell], player_id, card_value)
+        position = h, board.transform_borders(transform, borders)
+        if best is None or position < best[0]:
+            best = position, transform
+
+    (h, transformed_borders), transform = best
+    digest = blake2b(pack("<Q8BBB", h, *transformed_borders, len(ids), value), digest_size=8).digest()
+    return int.from_bytes(digest, "little"), transform
+
+
+class Book:
+    """
+    best plays of the first rounds, built offline (see build_book) and read from disk on the first lookup
+    a missing file is an empty book
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self.max_cards = 0
+        self._moves: Dict[int, int] = None
+
+    def _load(self) -> Dict[int, int]:
+        if self._moves is None:
+            self._moves, self.max_cards = read_book(self.path) if os_path.exists(self.path) else ({}, 0)
+        return self._moves
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def get(self, game: Game, card: Card) -> Tuple[int, int]:
+        """
+        :param game: the current state of the game, game.players in order of play
+        :param card: the card to play, card.player is the player to move
+        :return: the play of the book, None if the position is not in the book
+        """
+        moves = self._load()
+        if len(game.board.played_cards) > self.max_cards:
+            return None
+        key, transform = book_key(game, card.player, card.value)
+        cell = moves.get(key)
+        if cell is None:
+            return None
+
+        board = game.board
+        x, y = board.transform_spot(INVERSE_TRANSFORMS[transform], cell % board.max_x, cell // board.max_x)
+        return (x, y) if board.is_valid_play(card, x, y) else None
+
+
+_books: Dict[str, Book] = {}
+
+
+def get_book(path: str = DEFAULT_PATH) -> Book:
+    # one book per file and process
+    if path not in _books:
+        _books[path] = Book(path)
+    return _books[path]
+
+
+def read_book(path: str) -> Tuple[Dict[int, int], int]:
+    """
+    :return: flat cell index of the play per book key, most cards played in a position of the book
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"[!] {path} is not an opening book!")
+        max_cards = f.read(1)[0]
+        count = int.from_bytes(f.read(4), "little")
+        keys = array("Q")
+        keys.fromfile(f, count)
+        cells = array("B")
+        cells.fromfile(f, count)
+    if byteorder == "big":
+        keys.byteswap()
+    return dict(zip(keys, cells)), max_cards
+
+
+def write_book(path: str, moves: Dict[int, int], max_cards: int) -> None:
+    keys = array("Q", sorted(moves))
+    cells = array("B", [moves[key] for key in keys])
+    if byteorder == "big":
+        keys.byteswap()
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(bytes([max_cards]))
+        f.write(len(keys).to_bytes(4, "little"))
+        keys.tofile(f)
+        cells.tofile(f)
+
+
+def _game(nr_of_players: int, plays: Plays, board_cls: Type[Board]) -> Game:
+    # game after plays, players 1, 2, ... play in turn, the decks are full sorted decks minus the played cards
+    decks = [[v for v in range(Card.min_val, Card.max_val + 1) for _ in range(2)] for _ in range(nr_of_players)]
+    for i, (value, _, _) in enumerate(plays):
+        decks[i % nr_of_players].remove(value)
+    players = tuple((i + 1, str(i + 1), tuple(deck)) for i, deck in enumerate(decks))
+
+    empty = board_cls(Board.null_card).snapshot()
+    game = Game.from_snapshot((empty, players, 1), board_cls)
+
+    # first card like Game.__init__ (no border update), then like play_card
+    value, x, y = plays[0]
+    game.board.set_card(game.players[0].get_card(value), x, y)
+    game.board.played_cards = [game.players[0].get_card(value)]
+    for i, (value, x, y) in enumerate(plays[1:], 1):
+        game.board.make_move(game.players[i % nr_of_players].get_card(value), x, y)
+
+    # the player to move first
+    mover = len(plays) % nr_of_players
+    game.players = game.players[mover:] + game.players[:mover]
+    return game
+
+
+def openings(nr_of_players: int, plies: int, board_cls: Type[Board] = Board) -> List[Plays]:
+    """
+    :param plies: most cards played in a position
+    :return: plays of every distinct position (see book_key) with 1 to plies cards played
+    """
+    level = [[(value, Board.x_mid, Board.y_mid)] for value in range(Card.min_val, Card.max_val + 1)]
+    positions = []
+    for ply in range(plies):
+        positions.extend(level)
+        if ply == plies - 1:
+            break
+
+        seen = set()
+        next_level = []
+        for plays in level:
+            game = _game(nr_of_players, plays, board_cls)
+            player = game.players[0]
+            for value in sorted(set(c.value for c in player.get_remaining_cards())):
+                for x, y in game.board.get_valid_plays(player.get_card(value)):
+                    child_plays = plays + [(value, x, y)]
+                    child = _game(nr_of_players, child_plays, board_cls)
+                    key, _ = book_key(child, child.players[0], 0)
+                    if key not in seen:
+                        seen.add(key)
+                        next_level.append(child_plays)
+        level = next_level
+    return positions
+
+
+def build_book(player_counts: Tuple[int, ...] = (1, 2, 3, 4), plies: int = 2, depth: int = None, breadth: int = 3,
+               board_cls: Type[Board] = Board, verbose: bool = False) -> Dict[int, int]:
+    """
+    searches every card value in every opening position (see openings) with search.best_move
+    :param plies: most cards played in a position, see openings
+    :param depth: plies to search, two rounds if None
+    :return: flat cell index of the best play (in the orientation of the book) per book key, see write_book
+    """
+    moves = {}
+    for nr_of_players in player_counts:
+        start = perf_counter()
+        for plays in openings(nr_of_players, plies, board_cls):
+            game = _game(nr_of_players, plays, board_cls)
+            player = game.players[0]
+            for value in sorted(set(c.value for c in player.get_remaining_cards())):
+                card = player.get_card(value)
+                key, transform = book_key(game, player, value)
+                if key in moves:
+                    continue
+                result = best_move(game, card, depth if depth is not None else 2 * nr_of_players, breadth)
+                if result.move is not None:
+                    x, y = game.board.transform_spot(transform, *result.move)
+                    moves[key] = y * game.board.max_x + x
+        if verbose:
+            print(f"[*] {nr_of_players} players: {len(moves)} entries ({perf_counter() - start:.0f} s)")
+    return moves
+
+
+def main():
+    parser = ArgumentParser(description="builds the opening book, the engine reads it from book.bin next to book.py")
+    parser.add_argument("--players", type=int, nargs="+", default=[1, 2, 3, 4], help="player counts of the book")
+    parser.add_argument("--plies", type=int, default=2, help="most cards played in a position of the book")
+    parser.add_argument("--depth", type=int, default=None, help="plies to search, two rounds if not given")
+    parser.add_argument("--breadth", type=int, default=3, help="plays searched per card")
+    parser.add_argument("--out", default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    moves = build_book(tuple(args.players), args.plies, args.depth, args.breadth, verbose=True)
+    write_book(args.out, moves, args.plies)
+    print(f"[*] Book written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
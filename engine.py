@@ -0,0 +1,258 @@
+from book import get_book
+from heuristic import TranspositionTable, Weights, get_best_spots, maximax
+from punto import Board, Card, Game, Player
+from random import Random, choice
+from search import MAXN, best_move, search
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Tuple, Type
+
+
+class Turn(NamedTuple):
+    player_id: int
+    value: int                # value of the played card
+    play: Tuple[int, int]     # None if the player had no valid play
+    won: bool
+
+
+class GameResult(NamedTuple):
+    winner: int               # player id, None if nobody won
+    names: Dict[int, str]     # name per player id
+    turns: List[Turn]
+    seconds: float
+
+
+class Agent:
+    """
+    chooses the plays of one player, called with the players already rotated (like in Game.do_turn)
+    """
+
+    def __call__(self, game: Game, card: Card) -> Tuple[int, int]:
+        """
+        :param card: the card to play, card.player is the player to move
+        :return: a valid play of card, None if there is none
+        """
+        raise NotImplementedError
+
+
+class RandomAgent(Agent):
+    def __init__(self, rng: Random = None):
+        """
+        :param rng: the global generator of the random module if None
+        """
+        self.rng = rng
+
+    def __call__(self, game: Game, card: Card) -> Tuple[int, int]:
+        plays = game.board.get_valid_plays(card)
+        if not plays:
+            return None
+        return (self.rng.choice if self.rng is not None else choice)(plays)
+
+
+class GreedyAgent(Agent):
+    # best spot of get_best_spots, no look ahead
+    def __init__(self, weights: Weights = None):
+        """
+        :param weights: weights of the heuristic, the current H_* weights if None
+        """
+        self.weights = weights
+
+    def __call__(self, game: Game, card: Card) -> Tuple[int, int]:
+        # get_best_spots also scores invalid spots (see H_INVALID_PLAY)
+        if not game.board.get_valid_plays(card):
+            return None
+        return get_best_spots(game.board, card, self.weights)[0][0]
+
+
+class MaximaxAgent(Agent):
+    def __init__(self, tt_size: int = 100_000, weights: Weights = None):
+        # cache is kept between turns (and games)
+        self.tt = TranspositionTable(tt_size)
+        self.weights = weights
+
+    def __call__(self, game: Game, card: Card) -> Tuple[int, int]:
+        if not game.board.get_valid_plays(card):
+            return None
+        return maximax(game, card, self.tt, weights=self.weights)
+
+
+class SearchAgent(Agent):
+    def __init__(self, depth: int = None, breadth: int = 3, mode: str = MAXN, time_budget_ms: float = None,
+                 tt_size: int = 100_000, weights: Weights = None):
+        """
+        :param depth: plies to search, see search.best_move
+        :param time_budget_ms: iterative deepening (search.search) for this long instead of a fixed depth if given
+        """
+        self.depth = depth
+        self.breadth = breadth
+        self.mode = mode
+        self.time_budget_ms = time_budget_ms
+        self.tt = TranspositionTable(tt_size)
+        self.weights = weights
+
+    def __call__(self, game: Game, card: Card) -> Tuple[int, int]:
+        if self.time_budget_ms is not None:
+            return search(game, card, self.time_budget_ms, self.breadth, self.mode, self.tt, weights=self.weights).move
+        return best_move(game, card, self.depth, self.breadth, self.mode, tt=self.tt, weights=self.weights).move
+
+
+class OpeningAgent(Agent):
+    """
+    plays of the opening book (if there is one) and random plays in the first round, agent afterwards
+    """
+
+    def __init__(self, agent: Agent, book: bool = True, random_first_round: bool = True, rng: Random = None):
+        self.agent = agent
+        self.book = book
+        self.random = RandomAgent(rng) if random_first_round else None
+
+    def __call__(self, game: Game, card: Card) -> Tuple[int, int]:
+        if self.book:
+            play = get_book().get(game, card)
+            if play is not None:
+                return play
+        if self.random is not None and len(game.board.played_cards) < len(game.players):
+            return self.random(game, card)
+        return self.agent(game, card)
+
+
+class HumanAgent(Agent):
+    """
+    asks for the play on the console
+    """
+
+    def __init__(self, recommend: Agent = None):
+        """
+        :param recommend: agent whose play is shown before asking, nothing is shown if None
+        """
+        self.recommend = recommend
+
+    def __call__(self, game: Game, card: Card) -> Tuple[int, int]:
+        if not game.board.get_valid_plays(card):
+            print(f"[!] No valid play for {card}, passing...")
+            return None
+        recommended = self.recommend(game, card) if self.recommend is not None else None
+        while True:
+            try:
+                if recommended is not None:
+                    print(f"[*] Maximax recommends to play {recommended[0]} {recommended[1]}")
+                pos = input("[*] Select the position to play the card: ").split(" ")
+                x = int(pos[0])
+                y = int(pos[1])
+            except (ValueError, IndexError):
+                print("[!] Please enter the position like this: 1 3 (for x=1 and y=3)")
+                continue
+            except KeyboardInterrupt:
+                print("\n[*] Exiting...")
+                exit()
+
+            if game.board.is_valid_play(card, x, y):
+                return x, y
+            print(f"[!] Card must be adjacent to existing cards or bigger then the card underneath.")
+
+
+class Observer:
+    """
+    gets notified of the progress of a game, e.g. to render it, does nothing by default
+    """
+
+    def on_turn(self, game: Game, player: Player, card: Card) -> None:
+        # player drew card, before the agent chooses
+        pass
+
+    def on_play(self, game: Game, turn: Turn) -> None:
+        pass
+
+    def on_end(self, game: Game, result: GameResult) -> None:
+        pass
+
+
+class ConsoleObserver(Observer):
+    def on_turn(self, game: Game, player: Player, card: Card) -> None:
+        print(game)
+        print(f"[*] Your topmost card is {card}.")
+
+    def on_end(self, game: Game, result: GameResult) -> None:
+        if result.winner is None:
+            print(f"[*] Game ended, no winner...")
+            return
+        print(game)
+        print(f"[*] Congrats {result.names[result.winner]}, you won!")
+
+
+class Engine:
+    """
+    headless game loop: agents choose the plays, observers (optional) render them
+    """
+
+    def __init__(self, game: Game, agents: Dict[int, Agent], observers: List[Observer] = None):
+        """
+        :param agents: agent per player id
+        """
+        self.game = game
+        self.agents = agents
+        self.observers = observers or []
+        self.turns: List[Turn] = []
+
+    def turn(self) -> Turn:
+        """
+        the player in turn draws a card and plays it (or passes if there is no valid play)
+        """
+        game = self.game
+        player = game.players[0]
+        card = player.get_next_card()
+        game.next_player()
+        for observer in self.observers:
+            observer.on_turn(game, player, card)
+
+        play = self.agents[player.get_player_id()](game, card)
+        won = False
+        if play is not None:
+            if not game.board.is_valid_play(card, *play):
+                raise ValueError(f"[!] Invalid play {play} of {player.get_name()} with card {card.value}!")
+            game.board.play_card(card, *play, False)
+            won = game.board.check_winner(player, *play)
+
+        turn = Turn(player.get_player_id(), card.value, play, won)
+        self.turns.append(turn)
+        for observer in self.observers:
+            observer.on_play(game, turn)
+        return turn
+
+    def play(self) -> GameResult:
+        """
+        plays turns until a player wins or all cards are played
+        """
+        start = perf_counter()
+        winner = None
+        while not self.game.is_done():
+            turn = self.turn()
+            if turn.won:
+                winner = turn.player_id
+                break
+
+        names = {p.get_player_id(): p.get_name() for p in self.game.players}
+        result = GameResult(winner, names, self.turns, perf_counter() - start)
+        for observer in self.observers:
+            observer.on_end(self.game, result)
+        return result
+
+
+def play_game(player_names: List[str], agents: List[Agent], rng: Random = None, board_cls: Type[Board] = Board,
+              observers: List[Observer] = None) -> GameResult:
+    """
+    :param agents: agent per player, in the order of player_names
+    :param rng: random generator for the decks and seating, see Game
+    """
+    game = Game(player_names, board_cls, rng)
+    return Engine(game, {i + 1: agent for i, agent in enumerate(agents)}, observers).play()
+
+
+def console_engine(game: Game) -> Engine:
+    """
+    console game of Game.play_round: me chooses with a recommendation of maximax, the other players play like the
+    computer (opening book, random first round, best spot of get_best_spots afterwards)
+    """
+    computer = OpeningAgent(GreedyAgent(), rng=game.rng)
+    human = HumanAgent(OpeningAgent(MaximaxAgent(), random_first_round=False))
+    agents = {p.get_player_id(): human if p is game.me else computer for p in game.players}
+    return Engine(game, agents, [ConsoleObserver()])
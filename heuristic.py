@@ -1,7 +1,13 @@
-from punto import Board, Card, Game
-from typing import List, Tuple
-
-# TODO: refine
+from collections import OrderedDict
+from functools import lru_cache
+from json import dump, load
+from punto import INVERSE_TRANSFORMS, Board, Card, Game, LineIndex, Player
+from stats import SearchStats
+from threats import find_tactics
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Tuple
+
+# defaults of the weights, tuned ones can be passed as Weights (see tuner.py)
 H_WIN = 1000
 H_IN_ROW = 10
 
@@ -16,31 +22,153 @@ H_OPPONENT_SUM = 2
 H_OUT_OF_SOFT_BOUNDS = -1
 H_INVALID_PLAY = -1000
 
-dirs = [
-    (+1, 0),   # top to bottom
-    (+1, +1),  # top left to bottom right
-    (0, +1),   # left to right
-    (+1, -1),  # top right to bottom left
-]
+# highest sum of the values of one player in the other three cells of a line
+MAX_LINE_SUM = 3 * Card.max_val
 
 
-def get_lines_from_pos(b: Board, x: int, y: int) -> List[List[Tuple[Tuple[int, int], Card]]]:
-    lines = []
-    for dy, dx in dirs:
+class Weights(NamedTuple):
+    win: float
+    in_row: float
+    overlay_opponent: float
+    overlay_own: float
+    total_sum: float
+    own_sum: float
+    cross_row_sum: float
+    opponent_sum: float
+    out_of_soft_bounds: float
+    invalid_play: float
+
+    @classmethod
+    def from_dict(cls, weights: Dict[str, float]) -> "Weights":
+        # missing weights are the defaults
+        unknown = [name for name in weights if name not in cls._fields]
+        if unknown:
+            raise ValueError(f"[!] Unknown heuristic weights {unknown}!")
+        return default_weights()._replace(**weights)
+
+
+def default_weights() -> Weights:
+    # the current H_* weights
+    return Weights(H_WIN, H_IN_ROW, H_OVERLAY_OPPONENT, H_OVERLAY_OWN, H_TOTAL_SUM, H_OWN_SUM, H_CROSS_ROW_SUM,
+                   H_OPPONENT_SUM, H_OUT_OF_SOFT_BOUNDS, H_INVALID_PLAY)
+
+
+def load_weights(path: str) -> Weights:
+    with open(path) as f:
+        return Weights.from_dict(load(f))
+
+
+def save_weights(path: str, weights: Weights) -> None:
+    with open(path, "w") as f:
+        dump(weights._asdict(), f, indent=2)
+
+
+def pattern_key(cards_in_row: int, own_sum: int, opponent_sum: int, out_of_soft_bounds: bool) -> int:
+    # packed line pattern, from the point of view of the player that places a card in the line
+    # own_sum and opponent_sum are the sums of the other three cells
+    sums = MAX_LINE_SUM + 1
+    return ((cards_in_row * sums + own_sum) * sums + opponent_sum) * 2 + out_of_soft_bounds
+
+
+@lru_cache(maxsize=8)
+def _build_pattern_table(h_own_sum: int, h_opponent_sum: int, h_out_of_soft_bounds: int) -> List[Tuple[int, int]]:
+    table = [(0, 0)] * pattern_key(4, MAX_LINE_SUM, MAX_LINE_SUM, True) + [(0, 0)]
+    for cards_in_row in range(1, 5):
+        for own_sum in range(MAX_LINE_SUM + 1):
+            for opponent_sum in range(MAX_LINE_SUM + 1):
+                score = h_own_sum * own_sum + h_opponent_sum * opponent_sum
+                for out_of_soft_bounds, penalty in [(False, 0), (True, h_out_of_soft_bounds)]:
+                    table[pattern_key(cards_in_row, own_sum, opponent_sum, out_of_soft_bounds)] = \
+                        cards_in_row, score + penalty
+    return table
+
+
+def get_pattern_table(weights: Weights = None) -> List[Tuple[int, int]]:
+    """
+    :param weights: the current H_* weights if None
+    :return: count of own cards and score without the value of the card per line pattern (see pattern_key),
+             built once per weights
+    """
+    if weights is None:
+        weights = default_weights()
+    return _build_pattern_table(weights.own_sum, weights.opponent_sum, weights.out_of_soft_bounds)
+
+
+@lru_cache(maxsize=1024)
+def get_out_of_soft_bounds(line_index: LineIndex, x_min: int, y_min: int, x_max: int, y_max: int) \
+        -> Tuple[bool, ...]:
+    """
+    :return: per line id, if one of its cells is outside the inner border in both directions
+    """
+    return tuple(
+        not all(x_min <= xi <= x_max or y_min <= yi <= y_max for xi, yi in cells) for cells in line_index.cells
+    )
 
-        # for each line of 4 in given direction, i.e.:
-        #  x x x x . . .; . x x x x . .; . . x x x x .; . . . x x x x
-        # -3-2-1 0         -2-1 0 1         -1 0 1 2          0 1 2 3
-        for s in range(-3, 1):
-            cards_pos = [(x + (s + i) * dx, y + (s + i) * dy) for i in range(4)]
 
-            if all(b.ob_x_min <= xi <= b.ob_x_max and b.ob_y_min <= yi <= b.ob_y_max for xi, yi in cards_pos):
-                lines.append([((xi, yi), b.get_card(xi, yi)) for xi, yi in cards_pos])
+class TranspositionTable:
+    """
+    bounded cache for search results, keyed by tuples starting with the zobrist hash of the board
+    when full, the least recently used entry is replaced
+    the entries depend on the weights of the heuristic -> one table per weights
+    """
 
-    return lines
+    def __init__(self, max_size: int = 100_000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple, value) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __str__(self) -> str:
+        return (
+            f"{len(self)}/{self.max_size} entries, {self.hits} hits, {self.misses} misses "
+            f"({self.hit_rate():.1%}), {self.evictions} evictions"
+        )
+
+
+def get_line_ids_from_pos(b: Board, x: int, y: int) -> List[int]:
+    # ids of all lines through x, y that lie completely within the outer borders
+    x_min, y_min, x_max, y_max = b.ob_x_min, b.ob_y_min, b.ob_x_max, b.ob_y_max
+    bounds = b.line_index.bounds
+    return [
+        line for line in b.line_index.lines_through[y][x]
+        if x_min <= bounds[line][0] and y_min <= bounds[line][1]
+        and bounds[line][2] <= x_max and bounds[line][3] <= y_max
+    ]
 
 
-def get_best_spots(board: Board, card: Card) -> List[Tuple[Tuple[int, int], int]]:
+def get_lines_from_pos(b: Board, x: int, y: int) -> List[List[Tuple[Tuple[int, int], Card]]]:
+    cells = b.line_index.cells
+    return [[((xi, yi), b.get_card(xi, yi)) for xi, yi in cells[line]] for line in get_line_ids_from_pos(b, x, y)]
+
+
+def get_best_spots(board: Board, card: Card, weights: Weights = None) -> List[Tuple[Tuple[int, int], int]]:
     """
     finds possible winning spots (see below) / or just good spots to place the card
     . x . . .
@@ -49,137 +177,315 @@ def get_best_spots(board: Board, card: Card) -> List[Tuple[Tuple[int, int], int]
     . . . . x
     :param card: the card to find lines for
     :param board: the board to find lines on
-    :return: all line segments
+    :param weights: weights of the heuristic, the current H_* weights if None
+    :return: all spots with their score, from best score to worst score
     """
+    return get_best_spots_batch(board, card.player, [card.value], weights)[card.value]
+
+
+def get_best_spots_batch(board: Board, player: Player, values: List[int] = None, weights: Weights = None) \
+        -> Dict[int, List[Tuple[Tuple[int, int], int]]]:
+    """
+    same as get_best_spots for a card of player per value, in one sweep of the playable area
+    -> validity, lines, soft bounds and overlay bonus are only calculated once per spot
+    :param player: the player to find spots for
+    :param values: the card values to find spots for, all if None
+    :param weights: weights of the heuristic, the current H_* weights if None
+    :return: spots with scores (see get_best_spots) per value
+    """
+    if values is None:
+        values = range(Card.min_val, Card.max_val + 1)
+    if weights is None:
+        weights = default_weights()
+    h_win, h_own_sum, h_cross_row_sum = weights.win, weights.own_sum, weights.cross_row_sum
     x_min = board.ib_x_min
     y_min = board.ib_y_min
     x_max = board.ib_x_max
     y_max = board.ib_y_max
 
-    player = card.player
+    own_counts, own_sums = board.get_line_stats(player)
+    totals = board.line_totals
+    patterns = get_pattern_table(weights)
+    out_of_soft_bounds = get_out_of_soft_bounds(board.line_index, x_min, y_min, x_max, y_max)
+    sums = MAX_LINE_SUM + 1
+    highest_card = player.get_card(Card.max_val)
 
     # init heuristic board with heatmap (the further away from dynamic middle, the worse) and invalid plays
-    h_spots = [[(
-        0, 0                                            # normal init (0 cards in row, 0 score)
-        if y_min <= y <= y_max and x_min <= x <= x_max  # if valid
-        else H_INVALID_PLAY                             # else apply invalid play
-    ) for x in range(board.max_x)] for y in range(board.max_x)]
-
-    # iterate playable board from top left to bottom right
-    for y in range(y_min, y_max + 1):
-        for x in range(x_min, x_max + 1):
-
-            # mark invalid plays and continue
-            if not board.is_valid_play(card, x, y):
-                h_spots[y][x] = 0, H_INVALID_PLAY
+    # all spots not set below (i.e. outside the inner border or invalid) keep the invalid play score
+    h_spots = {value: [[(0, weights.invalid_play)] * board.max_x for _ in range(board.max_y)] for value in values}
+
+    # only spots where at least the highest card can be played (from top left to bottom right), all others are invalid
+    for x, y in board.get_valid_plays(highest_card):
+
+        # the card would replace original_card, correct the line aggregates of the board for that
+        original_card = board.get_card(x, y)
+        if original_card.player is player:
+            own_count_diff = 0
+            own_sum_diff = -original_card.value
+            opponent_sum_diff = 0
+        else:
+            own_count_diff = 1
+            own_sum_diff = 0
+            opponent_sum_diff = -original_card.value
+
+        # test for overlay bonus, the higher the other card, the better
+        if original_card.player is not player:
+            overlay_bonus = original_card.value * weights.overlay_opponent
+        else:
+            overlay_bonus = original_card.value * weights.overlay_own
+
+        # heuristics of spot when placing card in current row, without the value of the card
+        # (count of own cards in line, score of own and other cards and soft bounds), see pattern_key
+        lines = [
+            patterns[(((own_counts[line] + own_count_diff) * sums + own_sums[line] + own_sum_diff) * sums
+                      + totals[line] - own_sums[line] + opponent_sum_diff) * 2 + out_of_soft_bounds[line]]
+            for line in get_line_ids_from_pos(board, x, y)
+        ]
+        lines.sort()  # fixed order -> same scores in every orientation of the board (see Board.canonical)
+
+        for value in values:
+            # must be bigger than the card underneath
+            if value <= original_card.value:
                 continue
 
-            # temporary change of board to calc heuristics
-            original_card = board.get_card(x, y)
-            board.set_card(card, x, y)
-
-            # test for overlay bonus, the higher the other card, the better
-            if original_card.player is not player:
-                overlay_bonus = original_card.value * H_OVERLAY_OPPONENT
-            else:
-                overlay_bonus = original_card.value * H_OVERLAY_OWN
-
-            lines = get_lines_from_pos(board, x, y)
-            for line in lines:
-
-                # heuristics of spot when placing card in current row
-                cards_in_row = sum(1 for _, c in line if c.player is player)            # count of own cards in line
-                own_sum = sum(c.value for _, c in line if c.player is player)           # sum of own cards in line
-                opponent_sum = sum(c.value for _, c in line if c.player is not player)  # sum of other cards in line
-                score = H_OWN_SUM * own_sum + H_OPPONENT_SUM * opponent_sum
-
-                # add out of soft bounds penalty
-                if not all(x_min <= xi <= x_max or y_min <= yi <= y_max for (xi, yi), _ in line):
-                    score += H_OUT_OF_SOFT_BOUNDS
-
-                # find crossing rows (and add score to them)
-                cards_existing, score_existing = h_spots[y][x]
+            # find crossing rows (and add score to them)
+            cards_existing, score_existing = 0, 0
+            for cards_in_row, score in lines:
                 in_row = cards_in_row if cards_in_row >= cards_existing else cards_existing
                 if in_row == 4:
-                    added_score = H_WIN
+                    score_existing = h_win
                 else:
-                    added_score = score + H_CROSS_ROW_SUM * score_existing + overlay_bonus
+                    score_existing = score + h_own_sum * value + h_cross_row_sum * score_existing + overlay_bonus
+                cards_existing = in_row
 
-                # save score for current line in x, y
-                h_spots[y][x] = in_row, added_score
+            # save score for all lines in x, y
+            h_spots[value][y][x] = cards_existing, score_existing
 
-            # revert board
-            board.set_card(original_card, x, y)
+    spots = {}
+    h_in_row, h_total_sum = weights.in_row, weights.total_sum
+    for value, value_h_spots in h_spots.items():
+        # flatten list and add index to find positions of spots easily
+        flat_h_spots = [((x, y), data) for y, row in enumerate(value_h_spots) for x, data in enumerate(row)]
 
-    # flatten list and add index to find positions of spots easily
-    flat_h_spots = [((x, y), data) for y, row in enumerate(h_spots) for x, data in enumerate(row)]
+        # convert data (in_row, score) to complete score
+        scores = [((x, y), h_in_row * in_row ** 2 + h_total_sum * score) for (x, y), (in_row, score) in flat_h_spots]
 
-    # convert data (in_row, score) to complete score
-    scores = [((x, y), H_IN_ROW * in_row ** 2 + H_TOTAL_SUM * score) for (x, y), (in_row, score) in flat_h_spots]
+        # sort spots, from best score to worst score
+        spots[value] = sorted(scores, key=lambda elem: (elem[1]), reverse=True)
+    return spots
 
-    # sort spots, from best score to worst score
-    sorted_h_spots = sorted(scores, key=lambda elem: (elem[1]), reverse=True)
-    return sorted_h_spots
 
+def evaluate(board: Board, players: List[Player], weights: Weights = None) -> List[float]:
+    """
+    static evaluation of a board for search, the share of each player in the total line potential
+    -> every value is >= 0 and all values sum up to 1 (needed for shallow pruning)
+    :param board: the board to evaluate
+    :param players: the players to evaluate the board for
+    :param weights: weights of the heuristic, the current H_* weights if None
+    :return: value per player, in order of players
+    """
+    if weights is None:
+        weights = default_weights()
+    x_min, y_min, x_max, y_max = board.ob_x_min, board.ob_y_min, board.ob_x_max, board.ob_y_max
+    lines = [
+        line for line, (lx_min, ly_min, lx_max, ly_max) in enumerate(board.line_index.bounds)
+        if x_min <= lx_min and y_min <= ly_min and lx_max <= x_max and ly_max <= y_max
+    ]
+
+    raw_scores = []
+    for player in players:
+        counts, sums = board.get_line_stats(player)
+        score = 1  # > 0, so that the total is never 0
+        for line in lines:
+            if counts[line] == 4:
+                score += weights.win
+            elif counts[line]:
+                score += weights.in_row * counts[line] ** 2 + weights.own_sum * sums[line]
+        raw_scores.append(score)
+
+    total = sum(raw_scores)
+    return [score / total for score in raw_scores]
+
+
+def get_best_spots_cached(board: Board, card: Card, tt: TranspositionTable, stats: SearchStats = None,
+                          weights: Weights = None) -> List[Tuple[Tuple[int, int], int]]:
+    return get_best_spots_batch_cached(board, card.player, [card.value], tt, stats, weights)[card.value]
+
+
+def get_best_spots_batch_cached(board: Board, player: Player, values: List[int], tt: TranspositionTable,
+                                stats: SearchStats = None, weights: Weights = None) \
+        -> Dict[int, List[Tuple[Tuple[int, int], int]]]:
+    # the spots only depend on the cards on the board, the borders and the card to play
+    # -> same spots for all rotations and mirrorings of the board, cached in the orientation of Board.canonical
+    (board_hash, borders), transform = board.canonical()
+    key = ("spots", board_hash, borders, player.get_player_id())
+    spots = {}
+    for value in values:
+        value_spots = tt.get(key + (value,))
+        if value_spots is not None and transform:
+            value_spots = transform_spots(board, INVERSE_TRANSFORMS[transform], value_spots)
+        spots[value] = value_spots
+
+    missing = [value for value, value_spots in spots.items() if value_spots is None]
+    if stats is not None:
+        stats.cache_hits += len(values) - len(missing)
+        stats.cache_misses += len(missing)
+    if missing:
+        start = perf_counter() if stats is not None else 0.0
+        batch = get_best_spots_batch(board, player, missing, weights)
+        if stats is not None:
+            stats.spots_calls += 1
+            stats.spots_time += perf_counter() - start
+        for value, value_spots in batch.items():
+            tt.put(key + (value,), transform_spots(board, transform, value_spots) if transform else value_spots)
+            spots[value] = value_spots
+    return spots
+
+
+def transform_spots(board: Board, transform: int, spots: List[Tuple[Tuple[int, int], int]]) \
+        -> List[Tuple[Tuple[int, int], int]]:
+    """
+    :param transform: see punto.TRANSFORMS
+    :return: spots with scores of get_best_spots for the transformed board, in the order get_best_spots gives them
+    """
+    moved = [(board.transform_spot(transform, x, y), score) for (x, y), score in spots]
+    return sorted(moved, key=lambda spot: (-spot[1], spot[0][1], spot[0][0]))
 
-# TODO: implement shallow pruning, correct and sanitycheck algo
+
+# TODO: correct and sanitycheck algo (max^n with shallow pruning and paranoid alpha beta are in search.py)
 # minimax devolves to 1 v all in multiplayer settings
 #   -> use maximax (maximize for all players individually)
-def maximax(game: Game, card: Card) -> Tuple[int, int]:
+class Maximax:
     """
-    :param card: the card to find best play for
-    :param game: the current state of game to find best play for
-    :return: best current play
+    state of one maximax decision, the score of every root play can be calculated on its own (see parallel.py)
     """
 
     nr_of_plays = 8
-    max_scores = [0] * nr_of_plays
     top_n_plays_per_round = [3, 3, 1]  # last 1 for lookahead strategy
     score_coef_per_round = [0.8, 0.6, 0.5]
     rounds_forward = len(top_n_plays_per_round)
 
-    def algo(play_nr: int, current_round: int, added_score: float):
-
-        # when in leaf check accumulated score and add to results if new max
-        if current_round == rounds_forward:
-            max_scores[play_nr] = added_score if added_score > max_scores[play_nr] else max_scores[play_nr]
-            return
+    def __init__(self, game: Game, tt: TranspositionTable = None, stats: SearchStats = None,
+                 weights: Weights = None):
+        # helper vars
+        self.me = game.players[0]
+        self.board = game.board
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.stats = stats
+        self.weights = weights
+        # players without cards left (e.g. the one playing its last card) do not play in later rounds
+        self.order = [player for player in game.players[1:] + [self.me] if player.cards_count()]
+        self.avg_cards = [player.get_avg_draw() for player in self.order]
+        self.draws = tuple(c.code for c in self.avg_cards)
+
+    def root_plays(self, card: Card) -> List[Tuple[Tuple[int, int], int]]:
+        # get top 8 valid plays
+        plays = get_best_spots_cached(self.board, card, self.tt, self.stats, self.weights)[:self.nr_of_plays]
+        if self.stats is not None:
+            self.stats.add_node(0, len(plays))
+        return plays
+
+    def play_score(self, card: Card, x0: int, y0: int, score0: int) -> float:
+        """
+        :return: best leaf score (at least 0) after playing card on x0, y0
+        """
+        board = self.board
+        start = perf_counter() if self.stats is not None else 0.0
+        board.make_move(card, x0, y0)
+        leaf_score = score0 + self.algo(0)
+        board.unmake_move()
+        if self.stats is not None:
+            self.stats.root_times[(x0, y0)] = perf_counter() - start
+        return leaf_score if leaf_score > 0 else 0
+
+    def algo(self, current_round: int) -> float:
+        """
+        :return: highest score that is added in the current and all following rounds
+        """
+        board = self.board
+        stats = self.stats
+
+        # no score is added after the last round
+        if current_round == self.rounds_forward:
+            if stats is not None:
+                stats.add_node(current_round + 1)
+            return 0
+
+        # the added score only depends on the board, the round and which cards are drawn
+        key = ("maximax", board.hash, board.borders(), self.draws, current_round)
+        best_score = self.tt.get(key)
+        if stats is not None:
+            stats.cache_hits += best_score is not None
+            stats.cache_misses += best_score is None
+        if best_score is not None:
+            if stats is not None:
+                stats.add_node(current_round + 1)
+            return best_score
+        children = 0
 
         # get best play per other players, and finally for own player
-        for player in game.players[1:] + [me]:
-            avg_card = player.get_avg_draw()
-            top_n_plays = top_n_plays_per_round[current_round]
-            top_plays = get_best_spots(board, avg_card)[:top_n_plays]
+        for player, avg_card in zip(self.order, self.avg_cards):
+            added_score = 0
+            top_n_plays = self.top_n_plays_per_round[current_round]
+            top_plays = get_best_spots_cached(board, avg_card, self.tt, stats, self.weights)[:top_n_plays]
+            children += len(top_plays)
 
             for (x, y), score in top_plays:
                 # only change score on own player
-                if player is me:
-                    added_score += score_coef_per_round[current_round] * score
+                if player is self.me:
+                    added_score += self.score_coef_per_round[current_round] * score
 
-                # store old card, set new card and evaluate new board
-                tmp_card = board.get_card(x, y)
-                board.set_card(avg_card, x, y)
-                algo(play_nr, current_round + 1, added_score)
+                # play card and evaluate new board
+                board.make_move(avg_card, x, y)
+                subtree_score = added_score + self.algo(current_round + 1)
+                if best_score is None or subtree_score > best_score:
+                    best_score = subtree_score
 
                 # revert play
-                board.set_card(tmp_card, x, y)
+                board.unmake_move()
 
-    # helper vars
-    me = game.players[0]
-    board = game.board
+        # nobody has a play left (e.g. all cards are played) -> nothing is added
+        if best_score is None:
+            best_score = 0
+        if stats is not None:
+            stats.add_node(current_round + 1, children)
+        self.tt.put(key, best_score)
+        return best_score
 
-    # get top 8 valid plays
-    original_plays = get_best_spots(board, card)[:nr_of_plays]
+
+def maximax(game: Game, card: Card, tt: TranspositionTable = None, stats: SearchStats = None,
+            weights: Weights = None) -> Tuple[int, int]:
+    """
+    :param card: the card to find best play for
+    :param game: the current state of game to find best play for
+    :param tt: table to cache spots and subtree scores in, can be reused for later turns, new table if None
+    :param stats: filled with the counters of the search if given
+    :param weights: weights of the heuristic, the current H_* weights if None
+    :return: best current play
+    """
+    # win right away or block the only threat, no need to search
+    forced = find_tactics(game.board, card, [p for p in game.players if p is not card.player]).forced
+    if forced is not None:
+        return forced
+
+    search = Maximax(game, tt, stats, weights)
+    original_plays = search.root_plays(card)
 
     # calculate score of each play
-    for i, ((x0, y0), score0) in enumerate(original_plays):
-        old_card = board.get_card(x0, y0)
-        board.set_card(card, x0, y0)
-        algo(i, 0, score0)
-        board.set_card(old_card, x0, y0)
+    max_scores = [search.play_score(card, x0, y0, score0) for (x0, y0), score0 in original_plays]
 
     # find index of highest score
     idx = max_scores.index(max(max_scores))
 
     # return x,y of highest score
     return original_plays[idx][0]
+
+
+def maximax_with_stats(game: Game, card: Card, tt: TranspositionTable = None, weights: Weights = None) \
+        -> Tuple[Tuple[int, int], SearchStats]:
+    """
+    maximax with instrumentation, see maximax
+    :return: best current play and the counters of its search
+    """
+    stats = SearchStats()
+    return maximax(game, card, tt, stats, weights), stats
@@ -0,0 +1,288 @@
+from heuristic import get_best_spots
+from math import log, sqrt
+from punto import Board, Card, Game, Player
+from random import Random
+from search import turn_order
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Tuple
+
+# playout policies, see MCTS
+RANDOM = "random"
+GREEDY = "greedy"
+
+# (card value, x, y), the card value is part of the action because the opponents' cards are hidden
+Action = Tuple[int, int, int]
+
+# the iterations play on a flat copy of the board with one cell of padding per side, see _Position
+_W = Board.max_x + 2
+_DIRECTIONS = (1, _W, _W + 1, _W - 1)
+_AROUND = tuple(dy * _W + dx for dy in (-1, 0, 1) for dx in (-1, 0, 1))
+_REJECTIONS = 8  # random cells tried before all cells of the inner border are scanned
+
+
+class _Position:
+    """
+    untracked copy of a board for the iterations of a search, the rules are the same as Board.is_valid_play,
+    Board.update_borders and Board.check_winner
+    no hashes, line aggregates, frontier or undo stack (playouts never read them), an iteration plays on a copy
+    """
+    __slots__ = ("owner", "value", "near", "borders")
+
+    def __init__(self, owner: List[int], value: List[int], near: List[bool], borders: List[int]):
+        self.owner = owner    # player id per padded cell, -1 for the padding
+        self.value = value    # card value per padded cell, above any card for the padding
+        self.near = near      # occupied or next to an occupied cell
+        self.borders = borders  # see Board.borders
+
+    @classmethod
+    def of(cls, board: Board) -> "_Position":
+        cells, borders, _ = board.snapshot()
+        size = _W * (board.max_y + 2)
+        position = cls([-1] * size, [Card.max_val + 1] * size, [False] * size, list(borders))
+        for i, code in enumerate(cells):
+            cell = (i // board.max_x + 1) * _W + i % board.max_x + 1
+            position.owner[cell], position.value[cell] = divmod(code, 10)
+            if code:
+                for d in _AROUND:
+                    position.near[cell + d] = True
+        return position
+
+    def copy(self) -> "_Position":
+        return _Position(self.owner[:], self.value[:], self.near[:], self.borders[:])
+
+    def plays(self, value: int) -> List[Tuple[int, int]]:
+        # all valid spots of a card of value
+        near, values = self.near, self.value
+        _, _, _, _, x_min, y_min, x_max, y_max = self.borders
+        return [(x, y) for y in range(y_min, y_max + 1) for x in range(x_min, x_max + 1)
+                if near[(y + 1) * _W + x + 1] and values[(y + 1) * _W + x + 1] < value]
+
+    def random_play(self, value: int, rng: Random) -> Tuple[int, int]:
+        # uniform over the valid spots without listing them first (random cells of the inner border until one is
+        # valid), None if there is none
+        near, values = self.near, self.value
+        _, _, _, _, x_min, y_min, x_max, y_max = self.borders
+        width = x_max - x_min + 1
+        area = width * (y_max - y_min + 1)
+        for _ in range(_REJECTIONS):
+            i = int(rng.random() * area)
+            x, y = x_min + i % width, y_min + i // width
+            cell = (y + 1) * _W + x + 1
+            if near[cell] and values[cell] < value:
+                return x, y
+        plays = self.plays(value)
+        return rng.choice(plays) if plays else None
+
+    def play(self, player_id: int, value: int, x: int, y: int) -> bool:
+        """
+        :return: True if the play completes a line of 4 of player_id
+        """
+        cell = (y + 1) * _W + x + 1
+        owner = self.owner
+        owner[cell] = player_id
+        self.value[cell] = value
+        near = self.near
+        for d in _AROUND:
+            near[cell + d] = True
+
+        # see Board.update_borders
+        b = self.borders
+        if x + 1 - Board.max_size > b[0]: b[0] = x + 1 - Board.max_size
+        if y + 1 - Board.max_size > b[1]: b[1] = y + 1 - Board.max_size
+        if x - 1 + Board.max_size < b[2]: b[2] = x - 1 + Board.max_size
+        if y - 1 + Board.max_size < b[3]: b[3] = y - 1 + Board.max_size
+        if x == b[4] and b[4] > b[0]: b[4] = x - 1
+        if y == b[5] and b[5] > b[1]: b[5] = y - 1
+        if x == b[6] and b[6] < b[2]: b[6] = x + 1
+        if y == b[7] and b[7] < b[3]: b[7] = y + 1
+
+        # cards of player_id in a row through the cell, in both ways of each direction
+        for d in _DIRECTIONS:
+            count = 1
+            i = cell + d
+            while owner[i] == player_id:
+                count += 1
+                i += d
+            i = cell - d
+            while owner[i] == player_id:
+                count += 1
+                i -= d
+            if count >= 4:
+                return True
+        return False
+
+
+class MCTSResult(NamedTuple):
+    move: Tuple[int, int]
+    visits: int               # visits of the chosen move
+    playouts: int             # playouts of this search
+    playouts_per_sec: float
+
+
+class Node:
+    def __init__(self, player_id: int = 0):
+        self.player_id = player_id  # player that made the move leading to this node
+        self.children: Dict[Action, "Node"] = {}
+        self.visits = 0
+        self.reward = 0.0
+        self.avail = 0  # how often the move was available when its parent was selected (information set mcts)
+
+    def ucb(self, c: float) -> float:
+        return self.reward / self.visits + c * sqrt(log(self.avail) / self.visits)
+
+
+class MCTS:
+    """
+    single observer information set monte carlo tree search (uct), the order of the cards of all players is hidden
+    -> every iteration draws random remaining cards for all players (determinization) and only follows the
+       moves that are possible with the drawn cards
+    iterations play on an untracked copy of the board (see _Position), the greedy policy also needs the board itself
+    the tree is kept between turns, report the moves played with advance
+    """
+
+    def __init__(self, policy: str = RANDOM, c: float = 0.7, seed: int = None):
+        """
+        :param policy: RANDOM or GREEDY (best spot of get_best_spots) plays in playouts
+        :param c: exploration constant
+        :param seed: seed for determinizations and playouts
+        """
+        if policy not in (RANDOM, GREEDY):
+            raise ValueError(f"[!] Unknown playout policy {policy}!")
+        self.policy = policy
+        self.c = c
+        self.rng = Random(seed)
+        self.root = Node()
+        # copy of the position of the root, None for a new tree, the moves reported with advance are played on it
+        self._board: Board = None
+
+    def advance(self, card: Card, x: int, y: int) -> None:
+        """
+        keep the subtree of a move that was played (by anyone), call for every play of the game
+        """
+        child = self.root.children.get((card.value, x, y))
+        if child is None or self._board is None:
+            self.root = Node()
+            self._board = None
+            return
+        self.root = child
+        self._board.play_card(card, x, y, False)
+
+    def search(self, game: Game, card: Card, iterations: int = None, time_budget_ms: float = None) -> MCTSResult:
+        """
+        :param game: the current state of game to find best play for
+        :param card: the card to find best play for, card.player is the player to move
+        :param iterations: number of playouts
+        :param time_budget_ms: time to search for (if iterations is None), 1 second if both are None
+        :return: the most visited play and the stats of the search
+        """
+        board = game.board
+
+        # the tree is only valid for the position it was built for (e.g. a play was not reported with advance)
+        if self._board is not None and (self._board.hash, self._board.borders()) != (board.hash, board.borders()):
+            self.root = Node()
+        self._board = type(board).from_snapshot(board.snapshot(), game.players)
+
+        order = turn_order(game, card.player)
+        ids = [p.get_player_id() for p in order]
+        decks = [[c.value for c in p.get_remaining_cards()] for p in order]
+        position = _Position.of(board)
+        deadline = perf_counter() + (time_budget_ms if time_budget_ms is not None else 1000) / 1000
+
+        start = perf_counter()
+        playouts = 0
+        while iterations is None and perf_counter() < deadline or iterations is not None and playouts < iterations:
+            self._iterate(position, board, order, ids, decks, card)
+            playouts += 1
+        elapsed = perf_counter() - start
+
+        valid = [(card.value, x, y) for x, y in board.get_valid_plays(card)]
+        if not valid:
+            return MCTSResult(None, 0, playouts, playouts / elapsed if elapsed else 0.0)
+        best = max(valid, key=lambda a: self.root.children[a].visits if a in self.root.children else -1)
+        visits = self.root.children[best].visits if best in self.root.children else 0
+        return MCTSResult(best[1:], visits, playouts, playouts / elapsed if elapsed else 0.0)
+
+    def _iterate(self, position: _Position, board: Board, order: List[Player], ids: List[int],
+                 decks: List[List[int]], card: Card) -> None:
+        # determinization: the card to play is known, all other draws are random remaining cards (drawn when
+        # needed, a shuffle of the whole decks would mostly be thrown away)
+        draws = [deck[:] for deck in decks]
+        random = self.rng.random
+
+        # plays go to a copy of position, board only follows them for the greedy policy
+        position = position.copy()
+        greedy = self.policy == GREEDY
+        made = 0
+        node = self.root
+        path = [node]
+        winner = None
+        turn = 0
+        passes = 0
+        in_tree = True
+
+        # selection and expansion, followed by the playout
+        while winner is None and passes < len(order):
+            i = turn % len(order)
+            turn += 1
+            deck = draws[i]
+            if turn == 1:
+                value = card.value
+            elif deck:
+                j = int(random() * len(deck))
+                value = deck[j]
+                deck[j] = deck[-1]
+                deck.pop()
+            else:
+                passes += 1
+                continue
+
+            if in_tree:
+                plays = position.plays(value)
+                play = self._select(node, value, plays) if plays else None
+                if play is not None:
+                    action = (value,) + play
+                    if action not in node.children:
+                        node.children[action] = Node(ids[i])
+                        node.children[action].avail = 1
+                        in_tree = False
+                    node = node.children[action]
+                    path.append(node)
+            elif greedy:
+                play = get_best_spots(board, order[i].get_card(value))[0][0] if position.plays(value) else None
+            else:
+                play = position.random_play(value, self.rng)
+            if play is None:
+                passes += 1
+                continue
+            passes = 0
+
+            if greedy:
+                board.make_move(order[i].get_card(value), *play)
+                made += 1
+            if position.play(ids[i], value, *play):
+                winner = ids[i]
+
+        # revert the plays of the greedy policy
+        for _ in range(made):
+            board.unmake_move()
+
+        # backpropagation, a draw is split between all players
+        for n in path:
+            n.visits += 1
+            if winner is None:
+                n.reward += 1 / len(order)
+            elif n.player_id == winner:
+                n.reward += 1
+
+    def _select(self, node: Node, value: int, plays: List[Tuple[int, int]]) -> Tuple[int, int]:
+        # untried play if there is one, else the available child with the highest ucb
+        untried = []
+        for x, y in plays:
+            child = node.children.get((value, x, y))
+            if child is None:
+                untried.append((x, y))
+            else:
+                child.avail += 1
+        if untried:
+            return self.rng.choice(untried)
+        return max(plays, key=lambda play: node.children[(value,) + play].ucb(self.c))
@@ -0,0 +1,68 @@
+from concurrent.futures import ProcessPoolExecutor
+from heuristic import Maximax, TranspositionTable
+from os import cpu_count
+from punto import Board, Card, Game
+from threats import find_tactics
+from typing import List, Tuple, Type
+
+# per worker process, kept between moves
+_tt = None
+
+
+def _init_worker(tt_size: int) -> None:
+    global _tt
+    _tt = TranspositionTable(tt_size)
+
+
+def _play_scores(snapshot: tuple, board_cls: Type[Board], card_code: int,
+                 plays: List[Tuple[Tuple[int, int], int]]) -> List[float]:
+    # runs in a worker: rebuild the game from its snapshot and score the given root plays
+    game = Game.from_snapshot(snapshot, board_cls)
+    player = next(p for p in game.players if p.get_player_id() == card_code // 10)
+    card = player.get_card(card_code % 10)
+    search = Maximax(game, _tt)
+    return [search.play_score(card, x0, y0, score0) for (x0, y0), score0 in plays]
+
+
+class ParallelMaximax:
+    """
+    maximax with the root plays scored in a pool of worker processes, the workers (and their caches) are kept alive
+    between moves, close the pool when done (or use as context manager)
+    gives the same plays as heuristic.maximax
+    """
+
+    def __init__(self, workers: int = None, tt_size: int = 100_000):
+        self.workers = workers or cpu_count() or 1
+        self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(tt_size,))
+
+    def __call__(self, game: Game, card: Card) -> Tuple[int, int]:
+        """
+        :param card: the card to find best play for
+        :param game: the current state of game to find best play for
+        :return: best current play
+        """
+        forced = find_tactics(game.board, card, [p for p in game.players if p is not card.player]).forced
+        if forced is not None:
+            return forced
+
+        original_plays = Maximax(game).root_plays(card)
+
+        # games are sent as snapshots, one task per root play (there are not more plays than workers usually)
+        snapshot = game.snapshot()
+        board_cls = type(game.board)
+        tasks = [self._pool.submit(_play_scores, snapshot, board_cls, card.to_code(), [play])
+                 for play in original_plays]
+        max_scores = [score for task in tasks for score in task.result()]
+
+        # find index of highest score
+        idx = max_scores.index(max(max_scores))
+        return original_plays[idx][0]
+
+    def close(self) -> None:
+        self._pool.shutdown()
+
+    def __enter__(self) -> "ParallelMaximax":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
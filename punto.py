@@ -1,35 +1,62 @@
 from console import black, white, red, blue, green, yellow, clear
-from random import choice, shuffle
-from typing import List, Tuple
+from functools import lru_cache
+from random import Random, shuffle
+from typing import List, Tuple, Type
 
 
 class Player:
-    def __init__(self, name: str, player_id: int):
+    def __init__(self, name: str, player_id: int, values: List[int] = None, rng: Random = None):
+        """
+        :param values: the remaining cards in order (last one is drawn next), a shuffled full deck if None
+        :param rng: random generator to shuffle the deck with, the global one of the random module if None
+        """
         self._name = name
         self._player_id = player_id
-        self._cards = [Card(self, i) for i in range(Card.min_val, Card.max_val + 1)]
-        self._cards.extend(self._cards)  # 1, 1, 2, 2, ...
-        shuffle(self._cards)
+
+        # one shared card object per value, the deck only holds references to them
+        self._value_cards = [Card(self, value) for value in range(Card.max_val + 1)]
+        if values is None:
+            self._cards = self._value_cards[Card.min_val:] * 2  # 1, 2, ..., 9, 1, 2, ...
+            (rng.shuffle if rng is not None else shuffle)(self._cards)
+        else:
+            self._cards = [self._value_cards[value] for value in values]
+
+        # remaining cards per value, updated on every draw
+        self._counts = [0] * (Card.max_val + 1)
+        for c in self._cards:
+            self._counts[c.value] += 1
 
     def get_name(self) -> str:
         return self._name
 
     def get_next_card(self) -> "Card":
-        return self._cards.pop()
+        card = self._cards.pop()
+        self._counts[card.value] -= 1
+        return card
 
     def peek_next_card(self) -> "Card":
-        return self._cards[0].copy()
+        # the card get_next_card returns next
+        return self._cards[-1]
+
+    def get_card(self, value: int) -> "Card":
+        # the shared card of this player with the value, cards are never changed -> no need to create new ones
+        return self._value_cards[value]
 
-    """
     def get_chance_of_drawing(self, other_val: int) -> float:
-        return len([c for c in self._cards if c.value > other_val]) / len(self._cards)
+        # chance that the next card is bigger than other_val
+        if not self._cards:
+            return 0.0
+        return sum(self._counts[other_val + 1:]) / len(self._cards)
 
     def get_drawing_chances(self) -> List[float]:
-        counts = [0] * (Card.max_val + 1)
-        for c in self._cards:
-            counts[c.value] += 1
-        return [c / len(self._cards) for c in counts]
-    """
+        # chance to draw each value next, indexed by value
+        if not self._cards:
+            return [0.0] * len(self._counts)
+        return [c / len(self._cards) for c in self._counts]
+
+    def get_remaining_counts(self) -> List[int]:
+        # only to be used by heuristics! remaining cards per value, indexed by value
+        return self._counts
 
     # TODO: maybe return 60% / 70% median to be more cautious with plays, or 30% / 40% median to be more risky
     def get_avg_draw(self) -> "Card":
@@ -53,36 +80,234 @@ class Player:
 
 
 class Card:
+    # no __dict__, the attributes are set once, use Player.get_card instead of creating new cards
+    __slots__ = ("player", "value", "player_id", "code", "_str")
+
     min_val = 1
     max_val = 9
 
     def __init__(self, player: Player, value: int = 0):
         self.player = player
         self.value = value
+        self.player_id = player.get_player_id()
+        self.code = self.player_id * 10 + value  # compact encoding, e.g. for snapshots
+        self._str = None
 
     def copy(self):
         return Card(self.player, self.value)
 
+    def to_code(self) -> int:
+        return self.code
+
     def __str__(self) -> str:
-        f = Board.id_to_col[self.player.get_player_id()]
-        return f(str(self.value))
-        # return str(self.player.player_id) + str(self.value)
+        # colored once, on first render
+        if self._str is None:
+            f = Board.id_to_col[self.player_id]
+            self._str = f(str(self.value))
+            # self._str = str(self.player_id) + str(self.value)
+        return self._str
+
+
+class LineIndex:
+    """
+    all lines of 4 cells on a board of the given size, built once per size (see get_line_index)
+    a line is identified by its index in cells / bounds, lines_through[y][x] holds the ids of all lines through x, y
+    """
+
+    # (dy, dx): top to bottom, top left to bottom right, left to right, top right to bottom left
+    dirs = [(+1, 0), (+1, +1), (0, +1), (+1, -1)]
+
+    def __init__(self, max_x: int, max_y: int):
+        self.cells: List[Tuple[Tuple[int, int], ...]] = []
+        self.bounds: List[Tuple[int, int, int, int]] = []  # x_min, y_min, x_max, y_max of each line
+        self.lines_through: List[List[List[int]]] = [[[] for _ in range(max_x)] for _ in range(max_y)]
+
+        ids = {}
+        for y in range(max_y):
+            for x in range(max_x):
+                for dy, dx in self.dirs:
+
+                    # for each line of 4 in given direction, i.e.:
+                    #  x x x x . . .; . x x x x . .; . . x x x x .; . . . x x x x
+                    # -3-2-1 0         -2-1 0 1         -1 0 1 2          0 1 2 3
+                    for s in range(-3, 1):
+                        cells = tuple((x + (s + i) * dx, y + (s + i) * dy) for i in range(4))
+                        if not all(0 <= xi < max_x and 0 <= yi < max_y for xi, yi in cells):
+                            continue
+                        if cells not in ids:
+                            ids[cells] = len(self.cells)
+                            self.cells.append(cells)
+                            xs = [xi for xi, _ in cells]
+                            ys = [yi for _, yi in cells]
+                            self.bounds.append((min(xs), min(ys), max(xs), max(ys)))
+                        self.lines_through[y][x].append(ids[cells])
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+
+@lru_cache(maxsize=None)
+def get_line_index(max_x: int, max_y: int) -> LineIndex:
+    return LineIndex(max_x, max_y)
+
+
+@lru_cache(maxsize=None)
+def get_blocks(max_x: int, max_y: int) -> Tuple[Tuple[int, ...], ...]:
+    # per flat cell index (y * max_x + x): flat indices of the cells of the 3x3 block around it (within the board)
+    return tuple(
+        tuple(j * max_x + i for j in range(max(y - 1, 0), min(y + 2, max_y))
+              for i in range(max(x - 1, 0), min(x + 2, max_x)))
+        for y in range(max_y) for x in range(max_x)
+    )
+
+
+@lru_cache(maxsize=None)
+def zobrist_key(cell: int, player_id: int, value: int) -> int:
+    # random 64 bit key per cell / card, seeded by its arguments -> same keys in every process and run
+    return Random(f"{cell}:{player_id}:{value}").getrandbits(64)
+
+
+# the 8 rotations and mirrorings of a square board around its middle, 0 is the identity
+# (a, b, c, d): x' = a * x + b * y, y' = c * x + d * y, with x and y relative to the middle
+TRANSFORMS = [
+    (1, 0, 0, 1), (0, -1, 1, 0), (-1, 0, 0, -1), (0, 1, -1, 0),
+    (-1, 0, 0, 1), (1, 0, 0, -1), (0, 1, 1, 0), (0, -1, -1, 0),
+]
+# transform that reverts the transform with the same index
+INVERSE_TRANSFORMS = [TRANSFORMS.index((a, c, b, d)) for a, b, c, d in TRANSFORMS]
+
+
+def transform_spot(transform: int, x: int, y: int, size: int) -> Tuple[int, int]:
+    a, b, c, d = TRANSFORMS[transform]
+    mid = (size - 1) // 2
+    return mid + a * (x - mid) + b * (y - mid), mid + c * (x - mid) + d * (y - mid)
+
+
+@lru_cache(maxsize=None)
+def get_cell_transforms(size: int) -> Tuple[Tuple[int, ...], ...]:
+    # per transform: flat cell index -> flat index of the transformed cell
+    return tuple(
+        tuple(yt * size + xt for y in range(size) for x in range(size) for xt, yt in [transform_spot(t, x, y, size)])
+        for t in range(len(TRANSFORMS))
+    )
+
+
+@lru_cache(maxsize=None)
+def symmetric_zobrist_keys(cell: int, player_id: int, value: int, size: int) -> Tuple[int, ...]:
+    # per transform: zobrist key of the card on the transformed cell
+    return tuple(zobrist_key(cells[cell], player_id, value) for cells in get_cell_transforms(size))
 
 
 class Board:
     null_player = Player("", 0)
-    null_card = Card(null_player, 0)
+    null_card = null_player.get_card(0)
 
     max_x = max_y = 11
     max_size = 6
     x_mid = (max_x - 1) // 2
     y_mid = (max_y - 1) // 2
 
+    line_index = get_line_index(max_x, max_y)
+    blocks = get_blocks(max_x, max_y)
+
     id_to_col = {0: black, 1: red, 2: green, 3: blue, 4: yellow}
 
     def __init__(self, card: Card):
         self._spots = [[self.null_card for _ in range(self.max_x)] for _ in range(self.max_y)]
+        self._init_tracking()
+        self._init_borders()
+
+        self.played_cards = [card]
+        self._place(card, self.x_mid, self.y_mid)
+
+    def _init_tracking(self) -> None:
+        # state kept up to date by _place (see _track_change)
+        # per line aggregates: sum of all card values and per player id card count and sum
+        self.line_totals = [0] * len(self.line_index)
+        self._line_stats = {}
+        # zobrist hash of the cards on the board, and of the board in every orientation (see TRANSFORMS)
+        self.hash = 0
+        self.hashes = [0] * len(TRANSFORMS)
+        # per flat cell index: value on top and number of cards in the 3x3 block around it
+        # frontier: empty cells next to a card, overlays[value]: cells with a card of that value on top
+        # -> the only cells where a card can be played (within the inner border), see get_valid_plays
+        self._values = [0] * (self.max_x * self.max_y)
+        self._neighbours = [0] * (self.max_x * self.max_y)
+        self._frontier = set()
+        self._overlays = [set() for _ in range(Card.max_val + 1)]
+        # one entry per make_move that is not yet reverted: x, y, card underneath, borders before the move
+        self._moves = []
+
+    def get_line_stats(self, player: Player) -> Tuple[List[int], List[int]]:
+        """
+        :param player: the player to get the aggregates for
+        :return: count of cards and sum of card values of the player, per line id
+        """
+        player_id = player.get_player_id()
+        if player_id not in self._line_stats:
+            self._line_stats[player_id] = [0] * len(self.line_index), [0] * len(self.line_index)
+        return self._line_stats[player_id]
+
+    def _update_hash(self, old: Card, card: Card, x: int, y: int) -> None:
+        # zobrist hash of all cards on the board, empty spots do not change the hash
+        cell = y * self.max_x + x
+        hashes = self.hashes
+        for c in (old, card):
+            if c.value:
+                keys = symmetric_zobrist_keys(cell, c.player_id, c.value, self.max_x)
+                for t in range(len(keys)):
+                    hashes[t] ^= keys[t]
+        self.hash = hashes[0]
+
+    def _track_change(self, old: Card, card: Card, x: int, y: int) -> None:
+        # keeps all incrementally updated state in sync, call before the spot is changed
+        self._update_lines(old, card, x, y)
+        self._update_hash(old, card, x, y)
+        self._update_frontier(old, card, x, y)
+
+    def _update_frontier(self, old: Card, card: Card, x: int, y: int) -> None:
+        cell = y * self.max_x + x
+        values = self._values
+        frontier = self._frontier
+        if old.value:
+            self._overlays[old.value].discard(cell)
+        if card.value:
+            self._overlays[card.value].add(cell)
+        values[cell] = card.value
+
+        # a card was added to or removed from the cell, update the neighbour counts of the block around it
+        if bool(old.value) != bool(card.value):
+            neighbours = self._neighbours
+            diff = 1 if card.value else -1
+            for n in self.blocks[cell]:
+                neighbours[n] += diff
+                if neighbours[n] and not values[n]:
+                    frontier.add(n)
+                else:
+                    frontier.discard(n)
+
+    def _update_lines(self, old: Card, card: Card, x: int, y: int) -> None:
+        lines = self.line_index.lines_through[y][x]
+        totals = self.line_totals
+        if old.value:
+            counts, sums = self.get_line_stats(old.player)
+            for line in lines:
+                counts[line] -= 1
+                sums[line] -= old.value
+                totals[line] -= old.value
+        if card.value:
+            counts, sums = self.get_line_stats(card.player)
+            for line in lines:
+                counts[line] += 1
+                sums[line] += card.value
+                totals[line] += card.value
+
+    def _place(self, card: Card, x: int, y: int) -> None:
+        # every change of a spot goes through here
+        self._track_change(self._spots[y][x], card, x, y)
+        self._spots[y][x] = card
 
+    def _init_borders(self) -> None:
         # both borders are inclusive, i.e. it's valid to play a card "on" the border
         # ensures that the playing field is not wider than 6x6
         self.ob_x_min = 0
@@ -96,14 +321,51 @@ class Board:
         self.ib_x_max = self.x_mid + 1
         self.ib_y_max = self.y_mid + 1
 
-        self.played_cards = [card]
-        self._spots[self.y_mid][self.x_mid] = card
+    def borders(self) -> Tuple[int, int, int, int, int, int, int, int]:
+        return (
+            self.ob_x_min, self.ob_y_min, self.ob_x_max, self.ob_y_max,
+            self.ib_x_min, self.ib_y_min, self.ib_x_max, self.ib_y_max,
+        )
 
     def get_card(self, x: int, y: int) -> Card:
         return self._spots[y][x]
 
+    @classmethod
+    def transform_spot(cls, transform: int, x: int, y: int) -> Tuple[int, int]:
+        return transform_spot(transform, x, y, cls.max_x)
+
+    @classmethod
+    def transform_borders(cls, transform: int, borders: Tuple[int, ...]) -> Tuple[int, ...]:
+        # both borders are rectangles, the transformed corners span the new ones
+        transformed = []
+        for x_min, y_min, x_max, y_max in (borders[:4], borders[4:]):
+            x0, y0 = cls.transform_spot(transform, x_min, y_min)
+            x1, y1 = cls.transform_spot(transform, x_max, y_max)
+            transformed += [min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)]
+        return tuple(transformed)
+
+    def canonical(self) -> Tuple[Tuple[int, Tuple[int, ...]], int]:
+        """
+        key of the position (cards and borders) that is the same for all rotations and mirrorings of the board
+        :return: the key and the transform (see TRANSFORMS) from this board to the orientation of the key
+        """
+        borders = self.borders()
+        return min(((h, self.transform_borders(t, borders)), t) for t, h in enumerate(self.hashes))
+
     def get_valid_plays(self, card: Card) -> List[Tuple[int, int]]:
-        return [(x, y) for y in range(self.max_y) for x in range(self.max_x) if self.is_valid_play(card, x, y)]
+        # only the frontier and the cells with a lower card on top can be valid, row by row like a scan of the board
+        if not card.value:
+            return []
+        cells = set(self._frontier)
+        for value in range(Card.min_val, card.value):
+            cells |= self._overlays[value]
+
+        plays = []
+        for cell in sorted(cells):
+            y, x = divmod(cell, self.max_x)
+            if self.ib_x_min <= x <= self.ib_x_max and self.ib_y_min <= y <= self.ib_y_max:
+                plays.append((x, y))
+        return plays
 
     def is_valid_play(self, card: Card, x: int, y: int) -> bool:
         # check if new card is bigger
@@ -114,18 +376,8 @@ class Board:
         if not self.ib_x_min <= x <= self.ib_x_max or not self.ib_y_min <= y <= self.ib_y_max:
             return False
 
-        # check adjacent, at least one direct or diagonally
-        x_minus = 0 if x == 0 else 1
-        x_plus = 0 if x == self.max_x - 1 else 1
-        y_minus = 0 if y == 0 else 1
-        y_plus = 0 if y == self.max_y - 1 else 1
-        adjacent_cards = [
-            self._spots[j][i] for j in range(y - y_minus, y + y_plus + 1) for i in range(x - x_minus, x + x_plus + 1)
-        ]
-        if not any(c.value for c in adjacent_cards):
-            return False
-
-        return True
+        # check adjacent, at least one direct or diagonally (or the card underneath)
+        return self._neighbours[y * self.max_x + x] > 0
 
     def update_borders(self, x: int, y: int) -> None:
         # shrink outer borders (on oppisite side of played card), +1 / -1 bc of index magic
@@ -144,40 +396,43 @@ class Board:
         if check_if_valid:
             if self.is_valid_play(card, x, y):
                 self.played_cards.append(card)
-                self._spots[y][x] = card
+                self._place(card, x, y)
                 self.update_borders(x, y)
                 return True
             return False
         else:
             self.played_cards.append(card)
-            self._spots[y][x] = card
+            self._place(card, x, y)
             self.update_borders(x, y)
             return True
 
     def set_card(self, card: Card, x: int, y: int) -> None:
         # only change spot, no checks, no new card in "cards played", has to be reverted, used by heuristics
-        self._spots[y][x] = card
+        self._place(card, x, y)
+
+    def make_move(self, card: Card, x: int, y: int) -> None:
+        """
+        play card on x, y without checks (like play_card), revert with unmake_move, used by the searches
+        borders, played cards, line aggregates, hash and frontier are exactly the ones of the new position
+        """
+        self._moves.append((x, y, self.get_card(x, y), self.borders()))
+        self.played_cards.append(card)
+        self._place(card, x, y)
+        self.update_borders(x, y)
+
+    def unmake_move(self) -> None:
+        # revert the last make_move that is not yet reverted
+        x, y, old, borders = self._moves.pop()
+        self._place(old, x, y)
+        self.set_borders(borders)
+        self.played_cards.pop()
 
     def check_winner(self, last_player: Player, x: int, y: int) -> bool:
-        x_minus = min(x, 3)
-        y_minus = min(y, 3)
-        x_plus = min(self.max_x - 1 - x, 3)
-        y_plus = min(self.max_y - 1 - y, 3)
-        rows = [  # [top to bottom, top left to bottom right, left to right, bottom left to top right]
-            [self._spots[y + j][x] for j in range(-y_minus, y_plus + 1)],
-            [self._spots[y + j][x + i] for j, i in zip(range(-y_minus, y_plus + 1), range(-x_minus, x_plus + 1))],
-            [self._spots[y][x + i] for i in range(-x_minus, x_plus + 1)],
-            [self._spots[y + j][x + i] for j, i in zip(range(y_plus, -y_minus - 1, -1), range(-x_minus, x_plus + 1))]
-        ]
-        for row in rows:
-            streak = 0
-            for c in row:
-                if c.player and c.player == last_player:
-                    streak += 1
-                    if streak == 4:
-                        return True
-                else:
-                    streak = 0
+        player_id = last_player.get_player_id()
+        spots = self._spots
+        for line in self.line_index.lines_through[y][x]:
+            if all(spots[yi][xi].player_id == player_id for xi, yi in self.line_index.cells[line]):
+                return True
         return False
 
     def get_observation(self) -> List[int]:
@@ -187,22 +442,59 @@ class Board:
         obs = []
         for row in self._spots:
             for card in row:
-                obs.append(card.player.get_player_id() * card.value)
+                obs.append(card.player_id * card.value)
         return obs
 
     def update_observation(self, obs: List[int], card: Card, x: int, y: int) -> None:
         # updates the current observation after a played card
         # 2d positions to index in flat list
         ind = self.max_y * y + x
-        obs[ind] = card.player.get_player_id() * card.value
+        obs[ind] = card.player_id * card.value
+
+    def set_borders(self, borders: Tuple[int, int, int, int, int, int, int, int]) -> None:
+        (
+            self.ob_x_min, self.ob_y_min, self.ob_x_max, self.ob_y_max,
+            self.ib_x_min, self.ib_y_min, self.ib_x_max, self.ib_y_max,
+        ) = borders
+
+    def snapshot(self) -> Tuple[Tuple[int, ...], Tuple[int, ...], Tuple[int, ...]]:
+        """
+        compact, cheap to pickle copy of the board, see from_snapshot
+        :return: card codes of all spots (row by row), borders, card codes of played cards
+        """
+        cells = tuple(self.get_card(x, y).to_code() for y in range(self.max_y) for x in range(self.max_x))
+        return cells, self.borders(), tuple(c.to_code() for c in self.played_cards)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Tuple[Tuple[int, ...], Tuple[int, ...], Tuple[int, ...]],
+                      players: List[Player]) -> "Board":
+        """
+        :param snapshot: see snapshot
+        :param players: the players the cards belong to
+        :return: new board with the state of the snapshot
+        """
+        cells, borders, played = snapshot
+        by_id = {p.get_player_id(): p for p in players}
+
+        def card(code: int) -> Card:
+            return by_id[code // 10].get_card(code % 10) if code else cls.null_card
+
+        board = cls(cls.null_card)
+        for i, code in enumerate(cells):
+            if code:
+                board._place(card(code), i % cls.max_x, i // cls.max_x)
+        board.set_borders(borders)
+        board.played_cards = [card(code) for code in played]
+        return board
 
     def reset(self, first_card: Card):
         for y in range(self.max_y):
             for x in range(self.max_x):
                 self._spots[y][x] = self.null_card
+        self._init_tracking()
 
         # set up for next game
-        self._spots[self.y_mid][self.x_mid] = first_card
+        self._place(first_card, self.x_mid, self.y_mid)
         self.played_cards = [first_card]
 
     def __str__(self) -> str:
@@ -212,29 +504,35 @@ class Board:
         for i in range(self.max_x):
             ind.append(white(str(i)) if self.ob_x_min <= i <= self.ob_x_max else black(str(i)))
         s += " ".join(ind) + "\n\n"
-        for j, row in enumerate(self._spots):
+        for j in range(self.max_y):
             # indices next to board
             s += white(str(j)) if self.ob_y_min <= j <= self.ob_y_max else black(str(j))
             s += " " * (4 - len(str(j)))  # pad
-            for card in row:
-                s += str(card) + " "
+            for i in range(self.max_x):
+                s += str(self.get_card(i, j)) + " "
             s += "\n"
         return s
 
 
 class Game:
 
-    def __init__(self, player_names: List[str]):
+    def __init__(self, player_names: List[str], board_cls: Type[Board] = Board, rng: Random = None):
+        """
+        :param rng: random generator for decks, seating and random plays, the global one of the random module if None
+        """
         if not player_names:
             raise ValueError("[!] Cannot create game for 0 players!")
-        self.players = [Player(name, i + 1) for i, name in enumerate(player_names)]
+        self.board_cls = board_cls
+        self.rng = rng
+        self.players = [Player(name, i + 1, rng=rng) for i, name in enumerate(player_names)]
         self.me = self.players[0]
-        shuffle(self.players)
+        (rng.shuffle if rng is not None else shuffle)(self.players)
 
         # place first card
         first_card = self.players[0].get_next_card()
-        self.board = Board(first_card)
+        self.board = board_cls(first_card)
         self.next_player()
+        self._engine = None
 
     def next_player(self) -> None:
         """
@@ -242,65 +540,53 @@ class Game:
         """
         self.players.append(self.players.pop(0))
 
-    def do_turn(self) -> Tuple[Player, Tuple[int, int]]:
-        from heuristic import get_best_spots, maximax
-
-        player = self.players[0]
-        card = player.get_next_card()
-        self.next_player()
+    def _get_engine(self) -> "Engine":
+        # created on the first turn, engine.py imports this module
+        if self._engine is None:
+            from engine import console_engine
+            self._engine = console_engine(self)
+        return self._engine
 
-        print(self)
-        print(f"[*] Your topmost card is {card}.")
-
-        # do not use maximax on other players
-        if player is not self.me:
-            if len(self.board.played_cards) < len(self.players):  # do random plays in first round
-                (x, y) = choice(self.board.get_valid_plays(card))
-            else:
-                (x, y), _ = get_best_spots(self.board, card)[0]
-            self.board.play_card(card, x, y, False)
-            return player, (x, y)
-
-        xm, ym = maximax(self, card)
-        while True:
-            while True:
-                try:
-                    print(f"[*] Maximax recommends to play {xm} {ym}")
-                    pos = input("[*] Select the position to play the card: ").split(" ")
-                    x = int(pos[0])
-                    y = int(pos[1])
-                    break
-                except (ValueError, IndexError):
-                    print("[!] Please enter the position like this: 1 3 (for x=1 and y=3)")
-                except KeyboardInterrupt:
-                    print("\n[*] Exiting...")
-                    exit()
-
-            if self.board.play_card(card, x, y):
-                break
-            else:
-                print(f"[!] Card must be adjacent to existing cards or bigger then the card underneath.")
-
-        return player, (x, y)
+    def do_turn(self) -> Tuple[Player, Tuple[int, int]]:
+        """
+        one turn of the console game, see engine.console_engine
+        :return: the player in turn and its play (None if it had no valid play)
+        """
+        turn = self._get_engine().turn()
+        return self.players[-1], turn.play
 
     def play_round(self) -> bool:
-        while True:
-            last_player, (x, y) = self.do_turn()
-            if self.board.check_winner(last_player, x, y):
-                print(self)
-                print(f"[*] Congrats {last_player.get_name()}, you won!")
-                return True
-            if self.is_done():
-                print(f"[*] Game ended, no winner...")
-                return True
+        self._get_engine().play()
+        return True
 
     def is_done(self) -> bool:
         return not any(p.cards_count() for p in self.players)
 
     def reset(self) -> int:
-        self.__init__([p.get_name() for p in self.players])
+        self.__init__([p.get_name() for p in self.players], self.board_cls, self.rng)
         return 0
 
+    def snapshot(self) -> tuple:
+        """
+        compact, cheap to pickle copy of the game (board, players with their remaining cards), see from_snapshot
+        """
+        players = tuple(
+            (p.get_player_id(), p.get_name(), tuple(c.value for c in p.get_remaining_cards())) for p in self.players
+        )
+        return self.board.snapshot(), players, self.me.get_player_id()
+
+    @classmethod
+    def from_snapshot(cls, snapshot: tuple, board_cls: Type[Board] = Board) -> "Game":
+        board_snapshot, players, me_id = snapshot
+        game = cls.__new__(cls)
+        game.board_cls = board_cls
+        game.rng = None
+        game.players = [Player(name, player_id, values) for player_id, name, values in players]
+        game.me = next(p for p in game.players if p.get_player_id() == me_id)
+        game.board = board_cls.from_snapshot(board_snapshot, game.players)
+        game._engine = None
+        return game
+
     def __str__(self) -> str:
         return clear() + str(self.board)
 
@@ -0,0 +1,335 @@
+from heuristic import TranspositionTable, Weights, evaluate, get_best_spots_batch_cached, get_best_spots_cached
+from punto import Board, Card, Game, Player
+from stats import SearchStats
+from threats import find_tactics
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Tuple
+
+# search modes, see best_move
+MAXN = "maxn"
+PARANOID = "paranoid"
+EXPECTIMAX = "expectimax"
+MODES = (MAXN, PARANOID, EXPECTIMAX)
+
+# all values of evaluate sum up to this
+MAX_SUM = 1.0
+
+
+class SearchResult(NamedTuple):
+    move: Tuple[int, int]
+    value: float  # value of the move for the player to move
+    depth: int    # plies searched
+    stats: SearchStats
+
+
+def turn_order(game: Game, player: Player) -> List[Player]:
+    """
+    :return: all players of the game that still have cards, in order of play starting with player
+    """
+    i = next(i for i, p in enumerate(game.players) if p is player)
+    order = game.players[i:] + game.players[:i]
+    return [player] + [p for p in order[1:] if p.cards_count()]
+
+
+def ordered_plays(board: Board, card: Card, breadth: int, tt: TranspositionTable, stats: SearchStats = None,
+                  weights: Weights = None) -> List[Tuple[int, int]]:
+    """
+    :return: the best (at most breadth) valid plays for card, best first according to get_best_spots
+    """
+    plays = []
+    for (x, y), _ in get_best_spots_cached(board, card, tt, stats, weights):
+        if len(plays) == breadth:
+            break
+        if board.is_valid_play(card, x, y):
+            plays.append((x, y))
+    return plays
+
+
+def with_hints(plays: List[Tuple[int, int]], hints: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    :return: hints first (even if they are not among plays), followed by the other plays in their order
+    """
+    return hints + [play for play in plays if play not in hints]
+
+
+class _Timeout(Exception):
+    pass
+
+
+class _Searcher:
+    """
+    depth limited search of a game from the point of view of one player
+    the player to move plays card, all later plies (own and of opponents) play the average draw of the player,
+    or every value the player can draw (EXPECTIMAX), players without cards left pass
+    """
+
+    def __init__(self, game: Game, card: Card, breadth: int, prune: bool, tt: TranspositionTable,
+                 stats: SearchStats, weights: Weights = None):
+        self.board = game.board
+        self.order = turn_order(game, card.player)
+        # the mover may be playing its last card, turn_order only keeps opponents with cards
+        self.avg_cards = [p.get_avg_draw() if p.cards_count() else None for p in self.order]
+        self.cards = [card] + self.avg_cards[1:]
+        self.breadth = breadth
+        self.prune = prune
+        self.tt = tt
+        self.stats = stats
+        self.weights = weights
+        self.deadline = None
+        self._made = 0  # moves on the board that are not reverted yet
+
+        # forced plays and threat spots of the opponents, searched first at the root
+        self.tactics = find_tactics(self.board, card, self.order[1:])
+
+        # for chance nodes: remaining cards per value, per player in turn order
+        self.counts = [list(p.get_remaining_counts()) for p in self.order]
+
+    def card_for(self, ply: int) -> Card:
+        i = ply % len(self.order)
+        return self.cards[i] if ply < len(self.order) else self.avg_cards[i]
+
+    def plays(self, ply: int, card: Card = None) -> List[Tuple[int, int]]:
+        if self.deadline is not None and perf_counter() > self.deadline:
+            raise _Timeout()
+        card = card or self.card_for(ply)
+        if card is None:  # no cards left -> pass
+            self.stats.add_node(ply)
+            return []
+        plays = ordered_plays(self.board, card, self.breadth, self.tt, self.stats, self.weights)
+        self.stats.add_node(ply, len(plays))
+        return plays
+
+    def winner_values(self, ply: int) -> List[float]:
+        values = [0.0] * len(self.order)
+        values[ply % len(self.order)] = MAX_SUM
+        return values
+
+    def play(self, ply: int, x: int, y: int, card: Card = None) -> bool:
+        # temporary change of board, has to be reverted with undo
+        card = card or self.card_for(ply)
+        self.board.make_move(card, x, y)
+        self._made += 1
+        return self.board.check_winner(card.player, x, y)
+
+    def undo(self) -> None:
+        self.board.unmake_move()
+        self._made -= 1
+
+    def undo_all(self) -> None:
+        while self._made:
+            self.undo()
+
+    def maxn(self, ply: int, depth: int, bound: float) -> List[float]:
+        """
+        max^n with shallow pruning (Korf), every player maximizes its own value
+        :param bound: stop as soon as the player to move is guaranteed at least this value (MAX_SUM - best of parent)
+        :return: value per player (in turn order)
+        """
+        if depth == 0:
+            self.stats.add_node(ply)
+            return evaluate(self.board, self.order, self.weights)
+
+        i = ply % len(self.order)
+        best = None
+        for x, y in self.plays(ply):
+            won = self.play(ply, x, y)
+            if won:
+                values = self.winner_values(ply)
+            else:
+                values = self.maxn(ply + 1, depth - 1, MAX_SUM if best is None else MAX_SUM - best[i])
+            self.undo()
+
+            if best is None or values[i] > best[i]:
+                best = values
+            if self.prune and best[i] >= bound:
+                break
+
+        # no valid play -> pass, bound was meant for the player that passes
+        return best if best is not None else self.maxn(ply + 1, depth - 1, MAX_SUM)
+
+    def paranoid(self, ply: int, depth: int, alpha: float, beta: float) -> float:
+        """
+        alpha beta search, the player to move maximizes its value, all opponents minimize it
+        :return: value of the player to move at the root
+        """
+        if depth == 0:
+            self.stats.add_node(ply)
+            return evaluate(self.board, self.order, self.weights)[0]
+
+        maximize = ply % len(self.order) == 0
+        best = None
+        for x, y in self.plays(ply):
+            won = self.play(ply, x, y)
+            if won:
+                value = MAX_SUM if maximize else 0.0
+            else:
+                value = self.paranoid(ply + 1, depth - 1, alpha, beta)
+            self.undo()
+
+            if maximize:
+                best = value if best is None or value > best else best
+                alpha = max(alpha, best)
+            else:
+                best = value if best is None or value < best else best
+                beta = min(beta, best)
+            if self.prune and alpha >= beta:
+                break
+
+        return best if best is not None else self.paranoid(ply + 1, depth - 1, alpha, beta)
+
+    def expectimax(self, ply: int, depth: int) -> List[float]:
+        """
+        max^n with a chance node before every play: each value the player can draw next is weighted with its
+        probability, the counts of remaining values are updated along the searched path
+        :return: expected value per player (in turn order)
+        """
+        if depth == 0:
+            self.stats.add_node(ply)
+            return evaluate(self.board, self.order, self.weights)
+
+        i = ply % len(self.order)
+        counts = self.counts[i]
+        total = sum(counts)
+        if not total:
+            return self.expectimax(ply + 1, depth - 1)
+
+        # spots for all values that can be drawn in one sweep, the plays of each value are then read from the cache
+        values = [value for value in range(Card.min_val, Card.max_val + 1) if counts[value]]
+        get_best_spots_batch_cached(self.board, self.order[i], values, self.tt, self.stats, self.weights)
+
+        expected = [0.0] * len(self.order)
+        for value in values:
+            # same value drawn -> same plays, duplicate cards in the deck are only searched once
+            card = self.order[i].get_card(value)
+            counts[value] -= 1
+            best = None
+            for x, y in self.plays(ply, card):
+                won = self.play(ply, x, y, card)
+                child = self.winner_values(ply) if won else self.expectimax(ply + 1, depth - 1)
+                self.undo()
+                if best is None or child[i] > best[i]:
+                    best = child
+            if best is None:  # no valid play -> pass
+                best = self.expectimax(ply + 1, depth - 1)
+            counts[value] += 1
+
+            chance = counts[value] / total
+            for k, v in enumerate(best):
+                expected[k] += chance * v
+        return expected
+
+    def root(self, depth: int, mode: str, plays: List[Tuple[int, int]] = None) -> Dict[Tuple[int, int], float]:
+        """
+        :param plays: plays to search, in this order (e.g. best first of a previous, shallower search)
+        :return: value for the player to move per play, the best play has the highest value
+        """
+        values = {}
+        best_value = None
+        if plays is None:
+            plays = with_hints(self.plays(0), self.tactics.hints)
+        else:
+            self.stats.add_node(0, len(plays))
+        for x, y in plays:
+            start = perf_counter()
+            won = self.play(0, x, y)
+            if won:
+                value = MAX_SUM
+            elif mode == PARANOID:
+                value = self.paranoid(1, depth - 1, 0.0 if best_value is None else best_value, MAX_SUM)
+            elif mode == EXPECTIMAX:
+                value = self.expectimax(1, depth - 1)[0]
+            else:
+                value = self.maxn(1, depth - 1, MAX_SUM if best_value is None else MAX_SUM - best_value)[0]
+            self.undo()
+            self.stats.root_times[(x, y)] = perf_counter() - start
+
+            values[(x, y)] = value
+            if best_value is None or value > best_value:
+                best_value = value
+        return values
+
+
+def _forced_result(searcher: _Searcher) -> SearchResult:
+    # win or only possible block, no need to search
+    move = searcher.tactics.forced
+    if move == searcher.tactics.win:
+        return SearchResult(move, MAX_SUM, 0, searcher.stats)
+    searcher.play(0, *move)
+    value = evaluate(searcher.board, searcher.order, searcher.weights)[0]
+    searcher.undo()
+    return SearchResult(move, value, 0, searcher.stats)
+
+
+def _best_of(values: Dict[Tuple[int, int], float]) -> Tuple[Tuple[int, int], float]:
+    # first play with the highest value
+    return max(values.items(), key=lambda item: item[1]) if values else (None, 0.0)
+
+
+def best_move(game: Game, card: Card, depth: int = None, breadth: int = 3, mode: str = MAXN, prune: bool = True,
+              tt: TranspositionTable = None, stats: SearchStats = None, weights: Weights = None) -> SearchResult:
+    """
+    multiplayer search with pruning, alternative to heuristic.maximax
+    :param game: the current state of game to find best play for
+    :param card: the card to find best play for, card.player is the player to move
+    :param depth: plies to search, one full round (one play per player) if None
+    :param breadth: plays per node, in order of get_best_spots
+    :param mode: MAXN (max^n with shallow pruning), PARANOID (alpha beta, all opponents against the player to move) or
+                 EXPECTIMAX (max^n over the distribution of the cards each player can draw, no pruning)
+    :param prune: False to search the full tree, only to measure the gain of pruning
+    :param tt: table to cache spots in, can be reused for later turns, new table if None
+    :param stats: counters to fill, new counters if None
+    :param weights: weights of the heuristic, the current H_* weights if None
+    :return: best play, its value, the searched depth and the counters
+    """
+    if mode not in MODES:
+        raise ValueError(f"[!] Unknown search mode {mode}!")
+    searcher = _Searcher(game, card, breadth, prune, tt if tt is not None else TranspositionTable(),
+                         stats if stats is not None else SearchStats(), weights)
+    if searcher.tactics.forced is not None:
+        return _forced_result(searcher)
+    depth = depth if depth is not None else len(searcher.order)
+    move, value = _best_of(searcher.root(depth, mode))
+    return SearchResult(move, value, depth, searcher.stats)
+
+
+def search(game: Game, card: Card, time_budget_ms: float, breadth: int = 3, mode: str = MAXN,
+           tt: TranspositionTable = None, stats: SearchStats = None, weights: Weights = None) -> SearchResult:
+    """
+    anytime version of best_move, deepens the search one round (one play per player) at a time until the budget is used
+    each iteration searches the plays in order of their value in the previous iteration
+    :param time_budget_ms: wall clock time to search for, the search stops as soon as it is exceeded
+    :return: best play of the deepest completed iteration, its value, that depth and the counters
+    """
+    if mode not in MODES:
+        raise ValueError(f"[!] Unknown search mode {mode}!")
+    # the setup (tactics, ordering of the root plays) counts against the budget too
+    deadline = perf_counter() + time_budget_ms / 1000
+    searcher = _Searcher(game, card, breadth, True, tt if tt is not None else TranspositionTable(),
+                         stats if stats is not None else SearchStats(), weights)
+    if searcher.tactics.forced is not None:
+        return _forced_result(searcher)
+    plays = ordered_plays(game.board, card, breadth, searcher.tt, searcher.stats, searcher.weights)
+    plays = with_hints(plays, searcher.tactics.hints)
+    searcher.deadline = deadline
+
+    # fallback if not even the first round can be searched in time
+    result = SearchResult(plays[0] if plays else None, 0.0, 0, searcher.stats)
+
+    # no need to search deeper than all remaining cards
+    max_depth = sum(p.cards_count() for p in searcher.order) + 1
+    depth = len(searcher.order)
+    while plays:
+        try:
+            values = searcher.root(depth, mode, plays)
+        except _Timeout:
+            searcher.undo_all()
+            break
+
+        move, value = _best_of(values)
+        result = SearchResult(move, value, depth, searcher.stats)
+        plays = sorted(plays, key=lambda play: values[play], reverse=True)
+        if value == MAX_SUM or depth >= max_depth:
+            break
+        depth += len(searcher.order)
+
+    return result
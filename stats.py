@@ -0,0 +1,124 @@
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+
+
+class SearchStats:
+    """
+    counters filled in by the search routines, pass an instance to a search to see how much work it did
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.nodes_per_depth: Dict[int, int] = {}  # depth: plies (rounds for maximax) from the root
+        self.children = 0                          # plays searched below expanded nodes
+        self.expanded = 0                          # nodes with at least one play
+        self.spots_calls = 0                       # calls of get_best_spots_batch (cache misses)
+        self.spots_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.root_times: Dict[Tuple[int, int], float] = {}  # seconds per root play
+
+    def add_node(self, depth: int, children: int = 0) -> None:
+        self.nodes += 1
+        self.nodes_per_depth[depth] = self.nodes_per_depth.get(depth, 0) + 1
+        if children:
+            self.expanded += 1
+            self.children += children
+
+    def branching_factor(self) -> float:
+        return self.children / self.expanded if self.expanded else 0.0
+
+    def hit_rate(self) -> float:
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else 0.0
+
+    def __str__(self) -> str:
+        depths = ", ".join(f"{depth}: {nodes}" for depth, nodes in sorted(self.nodes_per_depth.items()))
+        s = f"{self.nodes} nodes ({depths}), branching factor {self.branching_factor():.2f}\n"
+        s += f"{self.spots_calls} get_best_spots calls ({self.spots_time * 1000:.1f} ms), "
+        s += f"{self.cache_hits} cache hits, {self.cache_misses} misses ({self.hit_rate():.1%})"
+        for (x, y), seconds in self.root_times.items():
+            s += f"\n  {x} {y}: {seconds * 1000:.1f} ms"
+        return s
+
+
+def _default_targets() -> List[Tuple[object, str]]:
+    # hot paths of the heuristics and boards, functions imported by name are patched in every module that uses them
+    import bitboard
+    import heuristic
+    import punto
+    import search
+
+    targets = [
+        (heuristic, "get_best_spots_batch"), (heuristic, "get_line_ids_from_pos"),
+        (heuristic, "evaluate"), (search, "evaluate"),
+        (heuristic, "find_tactics"), (search, "find_tactics"),
+    ]
+    for cls in (punto.Board, bitboard.BitBoard):
+        for name in ("get_valid_plays", "is_valid_play", "check_winner", "make_move", "unmake_move", "_place"):
+            targets.append((cls, name))
+    return targets
+
+
+class Profiler:
+    """
+    counts calls and inclusive time of hot functions, they are only wrapped while the profiler is enabled
+    -> no overhead at all when disabled
+    with Profiler() as profiler:
+        maximax(game, card)
+    print(profiler)
+    """
+
+    def __init__(self, targets: List[Tuple[object, str]] = None):
+        """
+        :param targets: (module or class, function name) to wrap, hot paths of heuristic and board if None
+        """
+        self.targets = targets
+        self.calls: Dict[str, int] = {}
+        self.time: Dict[str, float] = {}
+        self._originals = []
+
+    def _wrap(self, f: Callable) -> Callable:
+        label = f"{f.__module__}.{f.__qualname__}"
+        self.calls.setdefault(label, 0)
+        self.time.setdefault(label, 0.0)
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                self.time[label] += perf_counter() - start
+                self.calls[label] += 1
+        return wrapper
+
+    def enable(self) -> None:
+        if self._originals:
+            return
+        for owner, name in self.targets if self.targets is not None else _default_targets():
+            # inherited methods are wrapped in the class that defines them
+            if name not in vars(owner):
+                continue
+            original = vars(owner)[name]
+            self._originals.append((owner, name, original))
+            setattr(owner, name, self._wrap(original))
+
+    def disable(self) -> None:
+        while self._originals:
+            owner, name, original = self._originals.pop()
+            setattr(owner, name, original)
+
+    def __enter__(self) -> "Profiler":
+        self.enable()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.disable()
+
+    def __str__(self) -> str:
+        lines = []
+        for label, seconds in sorted(self.time.items(), key=lambda item: item[1], reverse=True):
+            calls = self.calls[label]
+            if calls:
+                lines.append(f"{label}: {calls} calls, {seconds * 1000:.1f} ms ({seconds / calls * 1e6:.1f} us/call)")
+        return "\n".join(lines)
@@ -1,6 +1,26 @@
-from heuristic import get_lines_from_pos
-from punto import Game, Player, Card
-from random import choice
+from bench import compare, corpus_position, headless_game
+from bitboard import BitBoard
+from book import Book, build_book, write_book
+from engine import Engine, GreedyAgent, MaximaxAgent, Observer, RandomAgent, play_game
+import heuristic
+from heuristic import TranspositionTable, evaluate, get_best_spots, get_best_spots_batch, get_best_spots_cached, \
+    get_lines_from_pos, maximax, maximax_with_stats, transform_spots
+from mcts import GREEDY, MCTS, _Position
+from parallel import ParallelMaximax
+from punto import Board, Game, Player, Card
+from threats import find_tactics, threats, winning_spots
+from tournament import AgentConfig, dealt_game, fit_elo, ratings, run, schedule
+from tuner import SPSA, TUNED, resume, tune
+from search import EXPECTIMAX, MAXN, PARANOID, best_move, search, turn_order
+from stats import Profiler
+import numpy as np
+import os
+from pytest import approx, importorskip
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from vecsim import BatchSimulator
+from random import Random, choice
+from typing import List
 
 players = ["StockMind", "DeepFish", "LeelaPunto0", "AlphaMinus1"]
 
@@ -51,7 +71,16 @@ def test_overlay():
 
 
 def test_check_winner():
-    pass  # TODO
+    p1 = Player("P1", 1)
+    board = Board(Card(p1, 1))
+
+    # diagonal close to the left border, (1, 5) is not the start of the line
+    for x, y in [(0, 4), (2, 6), (3, 7)]:
+        assert not board.check_winner(p1, 1, 5)
+        board.set_card(Card(p1, 3), x, y)
+    board.set_card(Card(p1, 3), 1, 5)
+    for x, y in [(0, 4), (1, 5), (2, 6), (3, 7)]:
+        assert board.check_winner(p1, x, y)
 
 
 def test_random_round():
@@ -140,6 +169,863 @@ def test_get_lines():
     assert line5 in lines
 
 
+def assert_same_board(board: Board, other: Board):
+    assert board.get_observation() == other.get_observation()
+    for attr in ["ob_x_min", "ob_y_min", "ob_x_max", "ob_y_max", "ib_x_min", "ib_y_min", "ib_x_max", "ib_y_max"]:
+        assert getattr(board, attr) == getattr(other, attr)
+    for y in range(board.max_y):
+        for x in range(board.max_x):
+            assert board.get_card(x, y) is other.get_card(x, y)
+
+
+def test_line_index():
+    index = Board.line_index
+    assert len(index) == 2 * 8 * 11 + 2 * 8 * 8  # rows + columns + both diagonals
+    for y in range(Board.max_y):
+        for x in range(Board.max_x):
+            lines = index.lines_through[y][x]
+            assert len(lines) == len(set(lines)) <= 16
+            assert all((x, y) in index.cells[line] for line in lines)
+    assert len(index.lines_through[Board.y_mid][Board.x_mid]) == 16
+    assert len(index.lines_through[0][0]) == 3
+
+
+def assert_line_stats(board: Board, game_players: List[Player]):
+    index = board.line_index
+    for player in game_players:
+        counts, sums = board.get_line_stats(player)
+        for line, cells in enumerate(index.cells):
+            cards = [board.get_card(x, y) for x, y in cells]
+            assert counts[line] == sum(1 for c in cards if c.player is player)
+            assert sums[line] == sum(c.value for c in cards if c.player is player)
+            assert board.line_totals[line] == sum(c.value for c in cards)
+
+
+def test_line_stats():
+    for board_cls in [Board, BitBoard]:
+        rng = Random(14)
+        game = Game(players[:3], board_cls, rng)
+        for _ in range(20):
+            card = game.players[0].get_next_card()
+            x, y = rng.choice(game.board.get_valid_plays(card))
+
+            # temporary change and revert, like the heuristics do
+            original_card = game.board.get_card(x, y)
+            game.board.set_card(card, x, y)
+            assert_line_stats(game.board, game.players)
+            game.board.set_card(original_card, x, y)
+
+            game.board.play_card(card, x, y, False)
+            game.next_player()
+        assert_line_stats(game.board, game.players)
+
+
+def random_game(nr_of_players: int, nr_of_plays: int, rng: Random, board_cls=Board) -> Game:
+    # decks, seating and plays from rng -> the same game for the same seed
+    game = Game(players[:nr_of_players], board_cls, rng)
+    for _ in range(nr_of_plays):
+        card = game.players[0].get_next_card()
+        game.board.play_card(card, *rng.choice(game.board.get_valid_plays(card)), False)
+        game.next_player()
+    return game
+
+
+def test_zobrist_hash():
+    p1 = Player("P1", 1)
+    p2 = Player("P2", 2)
+    first = Card(p1, 5)
+    moves = [(Card(p2, 3), 6, 5), (Card(p1, 7), 4, 4), (Card(p2, 8), 6, 5), (Card(p1, 2), 5, 6)]
+
+    for board_cls in [Board, BitBoard]:
+        board = board_cls(first)
+        other = board_cls(first)
+        empty_hash = board_cls(Board.null_card).hash
+        assert board.hash != empty_hash
+
+        for card, x, y in moves:
+            old_hash = board.hash
+            original_card = board.get_card(x, y)
+            board.set_card(card, x, y)
+            assert board.hash != old_hash
+            board.set_card(original_card, x, y)
+            assert board.hash == old_hash
+            board.play_card(card, x, y, False)
+
+        # same cards on the same spots -> same hash, independent of the order they were played in
+        for card, x, y in [moves[3], moves[1], moves[2]]:
+            other.play_card(card, x, y, False)
+        assert board.hash == other.hash
+
+
+def test_transposition_table():
+    tt = TranspositionTable(max_size=2)
+    assert tt.get((1,)) is None
+    tt.put((1,), "a")
+    tt.put((2,), "b")
+    assert tt.get((1,)) == "a"
+    tt.put((3,), "c")  # evicts least recently used (2,)
+    assert tt.get((2,)) is None
+    assert tt.get((1,)) == "a" and tt.get((3,)) == "c"
+    assert len(tt) == 2
+    assert tt.hits == 3 and tt.misses == 2 and tt.evictions == 1
+    assert tt.hit_rate() == 3 / 5
+
+
+def test_maximax_transposition_table():
+    game = random_game(3, 6, Random(1))
+    card = game.players[0].peek_next_card()
+    tt = TranspositionTable()
+    play = maximax(game, card, tt)
+    assert tt.hits > 0
+    assert maximax(game, card, tt) == play
+    assert maximax(game, card, TranspositionTable(max_size=10)) == play
+    assert game.board.get_valid_plays(card) and play in game.board.get_valid_plays(card)
+
+
+def test_search_pruning():
+    for nr_of_players in [2, 3, 4]:
+        game = random_game(nr_of_players, 6, Random(2))
+        card = game.players[0].get_next_card()
+        observation = game.board.get_observation()
+
+        for mode in [MAXN, PARANOID]:
+            pruned = best_move(game, card, depth=nr_of_players + 1, mode=mode)
+            full = best_move(game, card, depth=nr_of_players + 1, mode=mode, prune=False)
+            assert pruned.value == full.value
+            assert pruned.stats.nodes <= full.stats.nodes
+            assert game.board.is_valid_play(card, *pruned.move)
+            assert 0 <= pruned.value <= 1
+
+        # search must leave the board as it was
+        assert game.board.get_observation() == observation
+
+
+def test_search_time_budget():
+    game = random_game(3, 6, Random(3))
+    card = game.players[0].get_next_card()
+    observation = game.board.get_observation()
+    hash_before = game.board.hash
+
+    for budget in [1, 200]:
+        start = perf_counter()
+        result = search(game, card, budget, mode=PARANOID)
+        assert perf_counter() - start < budget / 1000 + 0.5
+        assert game.board.is_valid_play(card, *result.move)
+        assert result.depth % 3 == 0
+
+        # stopped searches must leave the board as it was too
+        assert game.board.get_observation() == observation
+        assert game.board.hash == hash_before
+
+    # the deepest iteration finds the same value as a plain search of the same depth
+    assert result.depth >= 3
+    assert result.value == best_move(game, card, depth=result.depth, mode=PARANOID).value
+
+
+def test_search_last_card():
+    # the player to move plays its last card, the opponent has one card left or none
+    for nr_of_plays in [33, 34]:
+        game = random_game(2, nr_of_plays, Random(0))
+        card = game.players[0].get_next_card()
+        game.next_player()
+        assert card.player.cards_count() == 0
+        for result in [best_move(game, card), best_move(game, card, depth=4, mode=EXPECTIMAX),
+                       best_move(game, card, depth=4, mode=PARANOID), search(game, card, 50)]:
+            assert game.board.is_valid_play(card, *result.move)
+        assert game.board.is_valid_play(card, *maximax(game, card))
+
+
+def test_snapshot():
+    for board_cls in [Board, BitBoard]:
+        game = random_game(3, 10, Random(4), board_cls)
+        copy = Game.from_snapshot(game.snapshot(), board_cls)
+        assert copy.board.get_observation() == game.board.get_observation()
+        assert copy.board.borders() == game.board.borders()
+        assert copy.board.hash == game.board.hash
+        assert [c.to_code() for c in copy.board.played_cards] == [c.to_code() for c in game.board.played_cards]
+        assert [p.get_player_id() for p in copy.players] == [p.get_player_id() for p in game.players]
+        assert copy.me.get_player_id() == game.me.get_player_id()
+        for p, q in zip(copy.players, game.players):
+            assert [c.value for c in p.get_remaining_cards()] == [c.value for c in q.get_remaining_cards()]
+            assert p.get_avg_draw().value == q.get_avg_draw().value
+
+
+def test_parallel_maximax():
+    with ParallelMaximax(workers=2) as parallel_maximax:
+        for seed in [5, 6]:
+            game = random_game(2, 4, Random(seed))
+            card = game.players[0].get_next_card()
+            assert parallel_maximax(game, card) == maximax(game, card)
+
+
+def test_get_best_spots_batch():
+    for nr_of_plays in [0, 5, 15]:
+        game = random_game(3, nr_of_plays, Random(6))
+        player = game.players[0]
+        spots = get_best_spots_batch(game.board, player)
+        assert sorted(spots) == list(range(Card.min_val, Card.max_val + 1))
+        for value, value_spots in spots.items():
+            assert value_spots == get_best_spots(game.board, Card(player, value))
+        assert get_best_spots_batch(game.board, player, [2, 7]) == {2: spots[2], 7: spots[7]}
+
+
+def test_drawing_chances():
+    p = Player("P", 1)
+    assert p.get_drawing_chances() == [0.0] + [1 / Card.max_val] * Card.max_val
+    assert p.get_chance_of_drawing(Card.max_val) == 0.0
+
+    while p.cards_count():
+        card = p.get_next_card()
+        remaining = [c.value for c in p.get_remaining_cards()]
+        assert p.get_remaining_counts() == [remaining.count(v) for v in range(Card.max_val + 1)]
+        if remaining:
+            assert sum(p.get_drawing_chances()) == approx(1.0)
+            assert p.get_chance_of_drawing(card.value) == len([v for v in remaining if v > card.value]) / len(remaining)
+    assert p.get_drawing_chances() == [0.0] * (Card.max_val + 1)
+
+    p = Player("P", 1, [4, 4, 7])
+    assert p.get_drawing_chances()[4] == 2 / 3 and p.get_drawing_chances()[7] == 1 / 3
+
+
+def test_expectimax():
+    game = random_game(3, 6, Random(7))
+    card = game.players[0].get_next_card()
+    observation = game.board.get_observation()
+    counts = [list(p.get_remaining_counts()) for p in game.players]
+
+    result = best_move(game, card, depth=3, mode=EXPECTIMAX)
+    assert game.board.is_valid_play(card, *result.move)
+    assert 0 <= result.value <= 1
+    assert game.board.get_observation() == observation
+    assert [p.get_remaining_counts() for p in game.players] == counts
+
+    # only one card left per player -> same as searching with the average draws
+    for p in game.players:
+        p._cards = p._cards[:1]
+        p._counts = [1 if v == p._cards[0].value else 0 for v in range(Card.max_val + 1)]
+    result = best_move(game, card, depth=3, mode=EXPECTIMAX)
+    assert result.value == approx(best_move(game, card, depth=3, mode=MAXN, prune=False).value)
+
+
+def test_mcts():
+    for board_cls, policy in [(Board, GREEDY), (BitBoard, None)]:
+        game = Game(players[:2], board_cls, Random(1))  # fixed decks, the playouts depend on them
+        me, opponent = game.players
+        for x in [6, 7, 8]:
+            game.board.play_card(Card(me, 2), x, 4, False)
+            game.board.play_card(Card(opponent, 2), x, 6, False)
+        observation = game.board.get_observation()
+
+        # the immediate win is found (else the opponent most likely wins with the next play)
+        mcts = MCTS(policy, seed=1) if policy else MCTS(seed=1)
+        card = Card(me, 5)
+        result = mcts.search(game, card, iterations=200)
+        assert result.move in [(5, 4), (9, 4)]
+        assert result.playouts == 200 and result.playouts_per_sec > 0
+        assert game.board.get_observation() == observation
+        assert len(game.board.played_cards) == 7
+
+    # tree is kept for the played move
+    game = random_game(3, 3, Random(8), BitBoard)
+    mcts = MCTS(seed=2)
+    card = game.players[0].get_next_card()
+    result = mcts.search(game, card, iterations=300)
+    mcts.advance(card, *result.move)
+    assert mcts.root.visits == result.visits > 0
+    game.board.play_card(card, *result.move)
+    game.next_player()
+    card = game.players[0].get_next_card()
+    assert game.board.is_valid_play(card, *mcts.search(game, card, iterations=100).move)
+    assert mcts.root.visits == result.visits + 100
+
+    # a play that was reported wrong (or not at all) gives a new tree on the next search
+    result = mcts.search(game, card, iterations=100)
+    plays = game.board.get_valid_plays(card)
+    mcts.advance(card, *result.move)
+    game.board.play_card(card, *next(play for play in plays if play != result.move))
+    game.next_player()
+    card = game.players[0].get_next_card()
+    mcts.search(game, card, iterations=50)
+    assert mcts.root.visits == 50
+
+
+def test_mcts_position():
+    # the untracked copy of the playouts follows the rules of the board
+    for seed in range(12):
+        rng = Random(seed)
+        game = Game(players[:2 + seed % 3], BitBoard if seed % 2 else Board, rng)
+        position = _Position.of(game.board)
+        while not game.is_done():
+            card = game.players[0].get_next_card()
+            game.next_player()
+            plays = game.board.get_valid_plays(card)
+            assert sorted(position.plays(card.value)) == sorted(plays)
+            play = position.random_play(card.value, rng)
+            assert play in plays if plays else play is None
+            if not plays:
+                continue
+            x, y = rng.choice(plays)
+            game.board.play_card(card, x, y, False)
+            won = position.play(card.player_id, card.value, x, y)
+            assert tuple(position.borders) == game.board.borders()
+            assert won == game.board.check_winner(card.player, x, y)
+            if won:
+                break
+
+
+def test_batch_simulator_parity():
+    n_games = 8
+    for nr_of_players in range(1, len(players) + 1):
+        sim = BatchSimulator(n_games, nr_of_players, seed=nr_of_players)
+        game_players = [Player(str(i), i + 1) for i in range(nr_of_players)]
+        boards = [Board(Card(game_players[0], int(sim.value[n, Board.y_mid, Board.x_mid]))) for n in range(n_games)]
+
+        while not sim.done.all():
+            ids, values = sim.current_cards()
+            valid = sim.valid_mask()
+            x, y = sim.random_actions(valid)
+            running = ~sim.done
+            won = sim.step(x, y, valid)
+
+            for n in range(n_games):
+                if not running[n]:
+                    continue
+                board = boards[n]
+                card = Card(game_players[ids[n] - 1], int(values[n]))
+                plays = board.get_valid_plays(card) if card.value else []
+                assert plays == [(int(i), int(j)) for j, i in zip(*valid[n].nonzero())]
+                if not plays:
+                    continue
+
+                board.play_card(card, int(x[n]), int(y[n]), False)
+                assert tuple(sim.borders[n]) == board.borders()
+                assert board.get_observation() == (sim.owner[n] * sim.value[n]).flatten().tolist()
+                assert bool(won[n]) == board.check_winner(card.player, int(x[n]), int(y[n]))
+                assert sim.done[n] or not won[n]
+
+        assert (sim.cards_left.sum(axis=1)[sim.winner == 0] == 0).all()
+
+
+def test_punto_vec_env():
+    # gym and stable_baselines3 are optional, ai.py needs both
+    importorskip("stable_baselines3")
+    from ai import PuntoVecEnv
+
+    n_envs = 8
+    env = PuntoVecEnv(n_envs, 2, seed=0)
+    sim = BatchSimulator(n_envs, 2, seed=0)  # same games, stepped directly
+    game_players = [Player("1", 1), Player("2", 2)]
+    rng = np.random.default_rng(0)
+
+    obs = env.reset()
+    sim.reset()
+    boards = [Board(Card(game_players[0], int(sim.value[n, Board.y_mid, Board.x_mid]))) for n in range(n_envs)]
+    resets = 0
+    for _ in range(200):
+        ids, values = sim.current_cards()
+        masks = env.action_masks()
+        for n in range(n_envs):
+            card = Card(game_players[ids[n] - 1], int(values[n]))
+            plays = boards[n].get_valid_plays(card) if card.value else []
+            assert sorted(plays) == sorted((int(i) % Board.max_x, int(i) // Board.max_x) for i in masks[n].nonzero()[0])
+        assert obs[:, -1].tolist() == values.tolist()
+
+        # random valid spots, every 5th game plays an invalid one
+        actions = (rng.random(masks.shape) * masks).argmax(axis=1)
+        actions[::5] = (rng.random(masks[::5].shape) * ~masks[::5]).argmax(axis=1)
+        valid_action = masks[np.arange(n_envs), actions]
+        had_play = masks.any(axis=1)
+        x, y = actions % Board.max_x, actions // Board.max_x
+
+        step_obs, rewards, dones, infos = env.step(actions)
+        assert step_obs is obs  # written in place
+        won = sim.step(x, y, sim.valid_mask() & valid_action[:, None, None])
+        assert rewards.tolist() == np.where(won > 0, 1, np.where(valid_action | ~had_play, 0, -1)).tolist()
+        assert dones.tolist() == sim.done.tolist()
+
+        for n in range(n_envs):
+            if valid_action[n]:
+                boards[n].play_card(Card(game_players[ids[n] - 1], int(values[n])), int(x[n]), int(y[n]), False)
+            board_obs = infos[n]["terminal_observation"][:-1] if dones[n] else obs[n, :-1]
+            assert board_obs.tolist() == (sim.owner[n] * sim.value[n]).flatten().tolist() == \
+                boards[n].get_observation()
+
+        if dones.any():
+            resets += 1
+            sim.reset(dones)
+            for n in dones.nonzero()[0]:
+                boards[n] = Board(Card(game_players[0], int(sim.value[n, Board.y_mid, Board.x_mid])))
+            assert obs[:, :-1].tolist() == (sim.owner * sim.value).reshape(n_envs, -1).tolist()
+    assert resets
+
+
+def test_shared_memory_vec_env():
+    importorskip("stable_baselines3")
+    from ai import PuntoVecEnv, SharedMemoryVecEnv
+    from multiprocessing.shared_memory import SharedMemory
+
+    # worker i steps the games of its slice with seed + i -> same games as a PuntoVecEnv per slice
+    env = SharedMemoryVecEnv(8, 2, n_workers=2, seed=3)
+    refs = [PuntoVecEnv(4, 2, seed=3), PuntoVecEnv(4, 2, seed=4)]
+    rng = np.random.default_rng(0)
+    try:
+        obs = env.reset()
+        assert obs.tolist() == np.concatenate([ref.reset() for ref in refs]).tolist()
+        for _ in range(100):
+            masks = env.action_masks()
+            assert masks.tolist() == np.concatenate([ref.action_masks() for ref in refs]).tolist()
+            actions = (rng.random(masks.shape) * masks).argmax(axis=1)
+            step = env.step(actions)
+            ref_steps = [ref.step(actions[4 * i:4 * (i + 1)]) for i, ref in enumerate(refs)]
+            for i in range(3):
+                assert step[i].tolist() == np.concatenate([ref_step[i] for ref_step in ref_steps]).tolist()
+            ref_infos = ref_steps[0][3] + ref_steps[1][3]
+            assert [info.keys() for info in step[3]] == [info.keys() for info in ref_infos]
+            for info, ref_info in zip(step[3], ref_infos):
+                if info:
+                    assert info["terminal_observation"].tolist() == ref_info["terminal_observation"].tolist()
+        assert env.get_attr("num_envs", [0, 5]) == [8, 8]
+    finally:
+        workers = env._workers
+        name = env._shm.name
+        env.close()
+    env.close()  # no op
+
+    # workers are stopped and the shared memory is freed
+    assert all(not worker.is_alive() and worker.exitcode == 0 for worker in workers)
+    try:
+        SharedMemory(name)
+        assert False
+    except FileNotFoundError:
+        pass
+
+
+def test_bitboard_parity():
+    for nr_of_players in range(1, len(players) + 1):
+        rng = Random(nr_of_players)
+        game = Game(players[:nr_of_players], rng=rng)
+        bit_board = BitBoard(game.board.played_cards[0])
+        assert_same_board(game.board, bit_board)
+
+        while not game.is_done():
+            player = game.players[0]
+            card = player.get_next_card()
+            actions = game.board.get_valid_plays(card)
+            assert actions == bit_board.get_valid_plays(card)
+            if not actions:
+                game.next_player()
+                continue
+
+            assert get_best_spots(game.board, card) == get_best_spots(bit_board, card)
+            x, y = rng.choice(actions)
+            assert bit_board.play_card(card, x, y) and game.board.play_card(card, x, y)
+            assert_same_board(game.board, bit_board)
+
+            won = game.board.check_winner(player, x, y)
+            assert won == bit_board.check_winner(player, x, y)
+            for other in game.players[1:]:
+                assert game.board.check_winner(other, x, y) == bit_board.check_winner(other, x, y)
+            if won:
+                break
+            game.next_player()
+
+
+def test_bitboard_check_winner():
+    p1 = Player("P1", 1)
+    p2 = Player("P2", 2)
+    for dx, dy in [(1, 0), (0, 1), (1, 1), (-1, 1)]:
+        board = Board(Card(p1, 1))
+        bit_board = BitBoard(Card(p1, 1))
+        for i in range(1, 4):
+            x, y = board.x_mid + i * dx, board.y_mid + i * dy
+            for b in [board, bit_board]:
+                assert not b.check_winner(p1, board.x_mid, board.y_mid)
+                b.play_card(Card(p1, 5), x, y, False)
+        for b in [board, bit_board]:
+            assert b.check_winner(p1, board.x_mid, board.y_mid)
+            assert not b.check_winner(p2, board.x_mid, board.y_mid)
+            b.set_card(Card(p2, 9), board.x_mid + dx, board.y_mid + dy)
+            assert not b.check_winner(p1, board.x_mid, board.y_mid)
+
+    # runs must not wrap around the edge of the board
+    bit_board = BitBoard(Card(p1, 1))
+    for x, y in [(9, 2), (10, 2), (0, 3), (1, 3)]:
+        bit_board.set_card(Card(p1, 5), x, y)
+    assert not bit_board.check_winner(p1, 10, 2)
+
+
+def test_frontier():
+    def scan(board: Board, card: Card):
+        return [(x, y) for y in range(board.max_y) for x in range(board.max_x) if board.is_valid_play(card, x, y)]
+
+    rng = Random(9)
+    game = random_game(3, 0, rng)
+    board = game.board
+    for _ in range(25):
+        card = game.players[0].get_next_card()
+        for value in range(Card.max_val + 1):
+            assert board.get_valid_plays(Card(card.player, value)) == scan(board, Card(card.player, value))
+
+        # temporary plays and their undo, like the searches do, restore the frontier
+        plays = board.get_valid_plays(card)
+        changes = []
+        for x, y in plays[:3]:
+            changes.append((board.get_card(x, y), x, y))
+            board.set_card(card, x, y)
+        for original_card, x, y in reversed(changes):
+            board.set_card(original_card, x, y)
+        assert board.get_valid_plays(card) == plays
+
+        board.play_card(card, *rng.choice(plays), False)
+        game.next_player()
+
+
+def test_make_move():
+    for board_cls in [Board, BitBoard]:
+        rng = Random(10)
+        game = random_game(2, 6, rng, board_cls)
+        board = game.board
+        before = board.snapshot(), board.hash, board.get_valid_plays(Card(game.players[0], 5))
+
+        # same position as with play_card, incl. borders and hash
+        for i in range(4):
+            card = game.players[i % 2].get_next_card()
+            x, y = rng.choice(board.get_valid_plays(card))
+            expected = board_cls.from_snapshot(board.snapshot(), game.players)
+            expected.play_card(card, x, y, False)
+            board.make_move(card, x, y)
+            assert board.snapshot() == expected.snapshot()
+            assert board.hash == expected.hash
+
+        for _ in range(4):
+            board.unmake_move()
+        assert (board.snapshot(), board.hash, board.get_valid_plays(Card(game.players[0], 5))) == before
+
+
+def test_shared_cards():
+    player = Player("P1", 1)
+    for _ in range(2 * (Card.max_val - Card.min_val + 1)):
+        card = player.peek_next_card()
+        assert player.get_next_card() is card
+        assert card is player.get_card(card.value)
+        assert card.code == card.to_code() == 10 + card.value
+    assert str(card) is str(card)
+
+    # restored boards use the shared cards of the players too
+    game = random_game(2, 8, Random(11))
+    board = Board.from_snapshot(game.board.snapshot(), game.players)
+    by_id = {p.get_player_id(): p for p in game.players}
+    for card in board.played_cards:
+        assert card is by_id[card.player_id].get_card(card.value)
+
+
+def test_threats():
+    game = Game(players[:3], rng=Random(15))
+    me, opponent, other = game.players
+    for x in [6, 7, 8]:
+        game.board.play_card(Card(opponent, 2), x, 6, False)
+    game.board.play_card(Card(me, 4), 9, 6, False)
+    game.board.play_card(Card(other, 9), 5, 4, False)
+
+    # the opponent wins with > 4 on 9, 6 (over my card) or with any card on 5, 6
+    assert winning_spots(game.board, opponent) == {(5, 6): 1, (9, 6): 5}
+    assert winning_spots(game.board, me) == {}
+    assert threats(game.board, [opponent, other]) == {(5, 6): 1.0, (9, 6): opponent.get_chance_of_drawing(4)}
+
+    # two threats, nothing forced, both are searched first
+    card = me.get_card(5)
+    tactics = find_tactics(game.board, card, [opponent, other])
+    assert tactics.forced is None and tactics.hints == [(5, 6), (9, 6)]
+    assert best_move(game, card, depth=1, breadth=1).stats.nodes >= 1 + len(tactics.hints)
+
+    # single threat: a block the opponent can overlay is only searched first, a safe one is played without a search
+    game.board.play_card(Card(me, 9), 9, 6, False)
+    assert find_tactics(game.board, card, [opponent, other]) == (None, None, [(5, 6)])
+    assert best_move(game, card).depth > 0
+    card = me.get_card(9)
+    assert find_tactics(game.board, card, [opponent, other]) == (None, (5, 6), [(5, 6)])
+    assert maximax(game, card) == (5, 6)
+    assert best_move(game, card).depth == 0
+    assert game.board.get_card(5, 6).value == 0
+
+    # own win goes first
+    for x in [6, 7, 8]:
+        game.board.play_card(Card(me, 1), x, 5, False)
+    card = me.get_card(9)
+    win = find_tactics(game.board, card, [opponent, other]).win
+    assert win in [(5, 5), (9, 5)]
+    assert maximax(game, card) == win
+    assert best_move(game, card).value == 1
+
+
+def test_pattern_table():
+    table = heuristic.get_pattern_table()
+    key = heuristic.pattern_key(2, 5, 7, True)
+    assert table[key] == (2, 5 * heuristic.H_OWN_SUM + 7 * heuristic.H_OPPONENT_SUM + heuristic.H_OUT_OF_SOFT_BOUNDS)
+
+    # changed weights -> new table, same scores as without the table
+    game = random_game(3, 10, Random(12))
+    card = game.players[0].get_next_card()
+    spots = get_best_spots(game.board, card)
+    heuristic.H_OPPONENT_SUM += 1
+    try:
+        assert heuristic.get_pattern_table()[key] == (2, table[key][1] + 7)
+        assert get_best_spots(game.board, card) != spots
+    finally:
+        heuristic.H_OPPONENT_SUM -= 1
+    assert heuristic.get_pattern_table() is table
+    assert get_best_spots(game.board, card) == spots
+
+
+def transformed_board(board: Board, game_players: List[Player], transform: int) -> Board:
+    cells, borders, played = board.snapshot()
+    moved = [0] * len(cells)
+    for i, code in enumerate(cells):
+        x, y = board.transform_spot(transform, i % board.max_x, i // board.max_x)
+        moved[y * board.max_x + x] = code
+    return type(board).from_snapshot((tuple(moved), board.transform_borders(transform, borders), played), game_players)
+
+
+def test_canonical():
+    game = random_game(3, 8, Random(13))
+    card = game.players[0].get_next_card()
+    key, _ = game.board.canonical()
+    spots = get_best_spots(game.board, card)
+
+    tt = TranspositionTable()
+    get_best_spots_cached(game.board, card, tt)
+    for transform in range(8):
+        board = transformed_board(game.board, game.players, transform)
+        assert board.canonical()[0] == key
+        assert board.hash == game.board.hashes[transform]
+
+        # cached spots of another orientation are mapped back, same as without the cache
+        expected = get_best_spots(board, card)
+        assert expected == transform_spots(game.board, transform, spots)
+        assert get_best_spots_cached(board, card, tt) == expected
+    assert tt.misses == 1 and tt.hits == 8
+
+    # the transform of canonical maps the board to the orientation of the key
+    _, transform = game.board.canonical()
+    board = transformed_board(game.board, game.players, transform)
+    assert board.canonical() == (key, 0)
+
+
+def test_opening_book():
+    with TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "book.bin")
+        write_book(path, build_book((2,), plies=1, depth=1), 1)
+        book = Book(path)
+        assert len(book) == 9 * 9  # first card and card to play
+
+        for seed in range(3):
+            game = Game(players[:2], rng=Random(seed))
+            card = game.players[0].get_next_card()
+            play = book.get(game, card)
+            assert game.board.is_valid_play(card, *play)
+
+            # as good as searching the position (other seatings and orientations than in the book)
+            game.board.make_move(card, *play)
+            value = evaluate(game.board, turn_order(game, card.player))[0]
+            game.board.unmake_move()
+            assert value == approx(best_move(game, card, depth=1).value)
+
+            game.board.play_card(card, *play)
+            game.next_player()
+            assert book.get(game, game.players[0].get_next_card()) is None  # only one card on the board in the book
+
+
+def test_bench():
+    game, card = corpus_position(3, 5, 10)
+    other, other_card = corpus_position(3, 5, 10)
+    assert game.snapshot() == other.snapshot() and card.code == other_card.code
+    assert headless_game(2, 1) == headless_game(2, 1)
+
+    baseline = {
+        "a_us": {"value": 10.0, "higher_is_better": False},
+        "b_per_sec": {"value": 10.0, "higher_is_better": True},
+    }
+    assert compare({"a_us": {"value": 12.0, "higher_is_better": False}}, baseline) == []
+    assert len(compare({"a_us": {"value": 13.0, "higher_is_better": False}}, baseline)) == 1
+    assert len(compare({"b_per_sec": {"value": 7.0, "higher_is_better": True}}, baseline)) == 1
+    assert compare({"b_per_sec": {"value": 70.0, "higher_is_better": True}}, baseline) == []
+
+
+def test_search_stats():
+    game, card = corpus_position(3, 2, 10)
+    assert find_tactics(game.board, card, game.players[1:]).forced is None
+    move, stats = maximax_with_stats(game, card)
+    assert move == maximax(game, card)
+    assert stats.nodes == sum(stats.nodes_per_depth.values()) and stats.nodes_per_depth[0] == 1
+    assert move in stats.root_times and len(stats.root_times) == stats.nodes_per_depth[1]
+    assert stats.spots_calls > 0 and stats.cache_misses > 0 and stats.branching_factor() > 1
+
+    result = best_move(game, card, depth=3, breadth=2)
+    assert result.stats.nodes_per_depth[0] == 1 and result.stats.branching_factor() <= 2
+
+    # functions are only wrapped while profiling
+    originals = heuristic.get_best_spots_batch, Board.make_move, BitBoard.check_winner
+    with Profiler() as profiler:
+        assert heuristic.get_best_spots_batch is not originals[0]
+        maximax(game, card)
+    assert (heuristic.get_best_spots_batch, Board.make_move, BitBoard.check_winner) == originals
+    assert profiler.calls["heuristic.get_best_spots_batch"] == stats.spots_calls
+    assert profiler.calls["punto.Board.make_move"] == profiler.calls["punto.Board.unmake_move"] > 0
+
+
+def test_engine():
+    class Recorder(Observer):
+        def __init__(self):
+            self.turns = []
+            self.result = None
+
+        def on_play(self, game, turn):
+            self.turns.append(turn)
+
+        def on_end(self, game, result):
+            self.result = result
+
+    for nr_of_players in (2, 3, 4):
+        recorder = Recorder()
+        agents = [GreedyAgent(), RandomAgent(Random(1)), GreedyAgent(), RandomAgent(Random(2))][:nr_of_players]
+        result = play_game(players[:nr_of_players], agents, Random(nr_of_players), observers=[recorder])
+        assert recorder.result is result and recorder.turns == result.turns
+        first, second = (play_game(players[:nr_of_players], agents[:1] * nr_of_players, Random(7)) for _ in range(2))
+        assert first[:3] == second[:3]
+
+        # replaying the turns gives valid plays, only the last one can win
+        replay = Game(players[:nr_of_players], rng=Random(nr_of_players))
+        for i, turn in enumerate(result.turns):
+            player = replay.players[0]
+            card = player.get_next_card()
+            replay.next_player()
+            assert (player.get_player_id(), card.value) == turn[:2]
+            if turn.play is None:
+                assert not replay.board.get_valid_plays(card)
+                continue
+            assert replay.board.play_card(card, *turn.play)
+            assert turn.won == replay.board.check_winner(player, *turn.play) == (i == len(result.turns) - 1 and
+                                                                               result.winner is not None)
+
+    # agents per player id, turn by turn
+    game = Game(players[:2], rng=Random(3))
+    engine = Engine(game, {1: MaximaxAgent(), 2: GreedyAgent()})
+    for _ in range(4):
+        turn = engine.turn()
+        assert turn.player_id == game.players[-1].get_player_id() and turn.play is not None
+    assert len(engine.turns) == 4 and len(game.board.played_cards) == 5
+
+    # no valid play: the board is full with nines -> the greedy agent passes, invalid plays are rejected
+    game = Game(players[:2], rng=Random(4))
+    opponent = game.players[1]
+    for y in range(Board.y_mid - 2, Board.y_mid + 4):
+        for x in range(Board.x_mid - 2, Board.x_mid + 4):
+            game.board.play_card(opponent.get_card(9), x, y, False)
+    turn = Engine(game, {1: GreedyAgent(), 2: GreedyAgent()}).turn()
+    assert turn.play is None and not turn.won and len(game.board.played_cards) == 1 + 36
+    try:
+        Engine(game, {1: lambda game, card: (0, 0), 2: lambda game, card: (0, 0)}).turn()
+        assert False
+    except ValueError:
+        pass
+
+
+def test_tournament():
+    # every agent plays every deck on every seat
+    tasks = schedule(3, 2, 2)
+    assert len(tasks) == 3 * 2 * 2 and len(set(task.game_id for task in tasks)) == len(tasks)
+    for table in [(0, 1), (0, 2), (1, 2)]:
+        for seed in set(task.seed for task in tasks):
+            seats = [task.seats() for task in tasks if task.table == table and task.seed == seed]
+            assert sorted(seats) == sorted([list(table), list(reversed(table))])
+
+    # paired decks: the same cards per seat, whoever sits there
+    game, other = dealt_game(["a", "b", "c"], 5), dealt_game(["c", "a", "b"], 5)
+    assert [p.get_player_id() for p in game.players] == [2, 3, 1]
+    assert game.snapshot()[0] == other.snapshot()[0]
+    assert [player[2] for player in game.snapshot()[1]] == [player[2] for player in other.snapshot()[1]]
+
+    elo = fit_elo(["a", "b", "c"], [("a", "b", 1.0)] * 8 + [("b", "c", 1.0)] * 8 + [("a", "c", 0.5)] * 2)
+    assert elo["a"] > elo["b"] > elo["c"] and sum(elo.values()) == approx(0, abs=1e-6)
+
+    configs = [AgentConfig("greedy", "greedy", weights={"in_row": 5}), AgentConfig("random", "random")]
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "games.jsonl")
+        records = run(configs, 2, 2, path=path, workers=1)
+        assert [record["game"] for record in records] == [0, 1, 2, 3]
+        assert all(record["winner"] in (None, "greedy", "random") for record in records)
+        with open(path) as f:
+            assert len(f.readlines()) == 1 + 4  # header and games
+        assert run(configs, 2, 2, path=path, workers=1) == records  # resumed, nothing played again
+        with open(path) as f:
+            assert len(f.readlines()) == 1 + 4
+        try:
+            run(configs, 2, 3, path=path, workers=1)  # other deals
+            assert False
+        except ValueError:
+            pass
+
+        # the random agent is seeded per game -> the same games on any number of workers
+        other = run(configs, 2, 2, path=os.path.join(directory, "other.jsonl"), workers=2)
+        assert [{**record, "seconds": 0} for record in other] == [{**record, "seconds": 0} for record in records]
+
+    table = ratings(["greedy", "random"], records, samples=20)
+    assert table["greedy"].games == table["random"].games == 4
+    assert table["greedy"].elo_low <= table["greedy"].elo <= table["greedy"].elo_high
+
+
+def test_weights():
+    game, card = corpus_position(3, 3, 16)
+    defaults = heuristic.default_weights()
+    assert get_best_spots(game.board, card, defaults) == get_best_spots(game.board, card)
+    assert evaluate(game.board, game.players, defaults) == evaluate(game.board, game.players)
+    assert maximax(game, card, weights=defaults) == maximax(game, card)
+
+    # weights are passed at runtime, the defaults stay untouched
+    no_rows = heuristic.Weights.from_dict({"in_row": 0, "total_sum": 0})
+    assert set(score for _, score in get_best_spots(game.board, card, no_rows)) == {0}
+    assert heuristic.default_weights() == defaults
+    try:
+        heuristic.Weights.from_dict({"H_WIN": 1})
+        assert False
+    except ValueError:
+        pass
+
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "weights.json")
+        heuristic.save_weights(path, no_rows)
+        assert heuristic.load_weights(path) == no_rows
+
+        # checkpoint after every iteration, resumed runs continue where they stopped
+        checkpoint = os.path.join(directory, "checkpoint.json")
+        spsa = SPSA(iterations=2, deals=1)
+        tune(spsa, workers=1, checkpoint=checkpoint)
+        resumed = SPSA.load(checkpoint)
+        assert resumed.iteration == 2 and resumed.theta == spsa.theta and len(resumed.scores) == 2
+        resumed.iterations = 3
+        weights = tune(resumed, workers=1, checkpoint=checkpoint)
+        assert SPSA.load(checkpoint).iteration == 3
+        assert weights == resumed.weights() and weights.invalid_play == defaults.invalid_play
+
+        # only the number of iterations may change on resume
+        assert resume(checkpoint, 4, 1, 0.2, 0.2, "greedy", 0).iterations == 4
+        try:
+            resume(checkpoint, 4, 2, 0.2, 0.2, "greedy", 0)
+            assert False
+        except ValueError:
+            pass
+
+    # weights keep their sign, even with huge steps
+    spsa = SPSA(iterations=1, deals=2, a=100, seed=5)
+    assert spsa.bound("in_row", -0.5) == 0 and spsa.bound("overlay_own", 0.5) == 0
+    assert spsa.bound("overlay_own", -0.5) == -0.5
+    with TemporaryDirectory() as directory:
+        weights = tune(spsa, workers=1, checkpoint=os.path.join(directory, "checkpoint.json"))
+    assert weights.own_sum == 0  # crossed over
+    for name in TUNED:
+        assert getattr(weights, name) * getattr(defaults, name) >= 0
+
+
 if __name__ == "__main__":
     for f in locals().copy():
         if f.startswith("test_"):
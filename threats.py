@@ -0,0 +1,73 @@
+from punto import Board, Card, Player
+from typing import Dict, List, NamedTuple, Tuple
+
+
+class Tactics(NamedTuple):
+    win: Tuple[int, int]          # play of the card that wins right away, None if there is none
+    block: Tuple[int, int]        # play of the card on the only spot opponents can win on, None if not forced
+                                  # (more spots, or the opponents keep a chance after the block)
+    hints: List[Tuple[int, int]]  # valid plays of the card on spots opponents can win on, most dangerous first
+
+    @property
+    def forced(self) -> Tuple[int, int]:
+        # play that needs no search, None if there is none
+        return self.win if self.win is not None else self.block
+
+
+def winning_spots(board: Board, player: Player) -> Dict[Tuple[int, int], int]:
+    """
+    spots where a card of player completes four in a row, only the lines through playable spots are checked
+    :return: lowest card value that wins, per spot (row by row)
+    """
+    counts, _ = board.get_line_stats(player)
+    player_id = player.get_player_id()
+    lines_through = board.line_index.lines_through
+    spots = {}
+    for x, y in board.get_valid_plays(player.get_card(Card.max_val)):
+        card = board.get_card(x, y)
+        if card.player_id == player_id:
+            continue
+
+        # the other three cards of the line are own cards
+        if any(counts[line] == 3 for line in lines_through[y][x]):
+            spots[(x, y)] = card.value + 1
+    return spots
+
+
+def threats(board: Board, players: List[Player]) -> Dict[Tuple[int, int], float]:
+    """
+    :param players: the players that could win
+    :return: chance that one of the players wins on the spot with its next card, per spot (highest of the players)
+    """
+    spots = {}
+    for player in players:
+        for spot, value in winning_spots(board, player).items():
+            chance = player.get_chance_of_drawing(value - 1)
+            if chance > spots.get(spot, 0.0):
+                spots[spot] = chance
+    return spots
+
+
+def find_tactics(board: Board, card: Card, opponents: List[Player]) -> Tactics:
+    """
+    cheap check for forced plays before a search
+    :param card: the card to play, card.player is the player to move
+    :param opponents: the players that move before the player to move again
+    :return: winning play, forced block and threat spots to search first (the board is the same afterwards)
+    """
+    for spot, value in winning_spots(board, card.player).items():
+        if card.value >= value:
+            return Tactics(spot, None, [])
+
+    danger = threats(board, opponents)
+    hints = sorted((spot for spot in danger if board.is_valid_play(card, *spot)), key=lambda spot: -danger[spot])
+
+    # a single threat is only forced if the block leaves the opponents no chance at all (they cannot overlay the
+    # card or win elsewhere), with more than one threat or a weak block the search has to decide
+    block = None
+    if len(danger) == 1 and hints:
+        board.make_move(card, *hints[0])
+        if not threats(board, opponents):
+            block = hints[0]
+        board.unmake_move()
+    return Tactics(None, block, hints)
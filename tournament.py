@@ -0,0 +1,290 @@
+from argparse import ArgumentParser
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from engine import Agent, Engine, GreedyAgent, MaximaxAgent, RandomAgent, SearchAgent
+from heuristic import Weights
+from itertools import combinations
+from json import dumps, load, loads
+from math import log10, sqrt
+from os import cpu_count, path as os_path
+from punto import Board, Game, Player
+from random import Random
+from typing import Dict, List, NamedTuple, Tuple, Type
+
+# agent kinds of the configs, the params of a config are passed to the class
+AGENTS = {"maximax": MaximaxAgent, "greedy": GreedyAgent, "random": RandomAgent, "search": SearchAgent}
+
+RESULTS_PATH = "tournament.jsonl"
+
+
+class AgentConfig(NamedTuple):
+    name: str
+    kind: str                  # key of AGENTS
+    params: Dict[str, object] = {}
+    weights: Dict[str, float] = {}  # weights of the heuristic that differ from the defaults, see heuristic.Weights
+
+    @classmethod
+    def from_dict(cls, config: dict) -> "AgentConfig":
+        if config.get("kind") not in AGENTS:
+            raise ValueError(f"[!] Unknown agent kind {config.get('kind')}, use one of {list(AGENTS)}!")
+        return cls(config.get("name", config["kind"]), config["kind"], config.get("params", {}),
+                   config.get("weights", {}))
+
+
+DEFAULT_AGENTS = [AgentConfig("maximax", "maximax"), AgentConfig("greedy", "greedy"),
+                  AgentConfig("search", "search", {"breadth": 2})]
+
+
+def make_agent(config: AgentConfig, rng: Random = None) -> Agent:
+    """
+    :param rng: generator of a random agent, the global one of the random module if None
+    """
+    if config.weights:
+        if config.kind == "random":
+            raise ValueError(f"[!] Agent {config.name} does not use the weights of the heuristic!")
+        return AGENTS[config.kind](**config.params, weights=Weights.from_dict(config.weights))
+    if config.kind == "random":
+        return RandomAgent(**config.params, rng=rng)
+    return AGENTS[config.kind](**config.params)
+
+
+class Task(NamedTuple):
+    game_id: int
+    table: Tuple[int, ...]  # agent indices of the players, in any order
+    seed: int               # seed of the decks, the same for all rotations of the table
+    rotation: int           # seat i is taken by table[(i + rotation) % len(table)]
+
+    def seats(self) -> List[int]:
+        return [self.table[(i + self.rotation) % len(self.table)] for i in range(len(self.table))]
+
+
+def schedule(nr_of_agents: int, nr_of_players: int, deals: int, seed: int = 0) -> List[Task]:
+    """
+    round robin: every table of nr_of_players different agents plays deals decks, each deck in every rotation of
+    the seats -> every agent plays every deck on every seat (paired games, less variance from the cards)
+    """
+    tasks = []
+    for table in combinations(range(nr_of_agents), nr_of_players):
+        for deal in range(deals):
+            for rotation in range(nr_of_players):
+                tasks.append(Task(len(tasks), table, seed * 1_000_003 + deal, rotation))
+    return tasks
+
+
+def dealt_game(names: List[str], seed: int, board_cls: Type[Board] = Board) -> Game:
+    """
+    :param names: player names in order of play, the first one places the first card
+    :return: game with the decks of seed per seat (the same for all names), otherwise like Game.__init__
+    """
+    rng = Random(seed)
+    decks = [tuple(c.value for c in Player("", 0, rng=rng).get_remaining_cards()) for _ in names]
+    players = tuple((i + 1, name, deck) for i, (name, deck) in enumerate(zip(names, decks)))
+    game = Game.from_snapshot((board_cls(Board.null_card).snapshot(), players, 1), board_cls)
+    game.board = board_cls(game.players[0].get_next_card())
+    game.next_player()
+    return game
+
+
+# per worker process: configs and their agents, agents (and their caches) are kept between games
+_configs: List[AgentConfig] = []
+_agents: Dict[int, Agent] = {}
+
+
+def _init_worker(configs: List[AgentConfig]) -> None:
+    global _configs
+    _configs = configs
+    _agents.clear()
+
+
+def play_task(task: Task, board_cls: Type[Board] = Board) -> dict:
+    """
+    runs in a worker
+    :return: json record of the game, seats and winner by agent name
+    """
+    seats = task.seats()
+    names = [_configs[i].name for i in seats]
+    game = dealt_game(names, task.seed, board_cls)
+    agents = {}
+    for seat, i in enumerate(seats):
+        if _configs[i].kind == "random":
+            # seeded per game and seat -> the same plays whichever worker runs the game (forked workers would
+            # otherwise share the state of the global generator)
+            agents[seat + 1] = make_agent(_configs[i], Random(f"{task.seed} {seat}"))
+            continue
+        if i not in _agents:
+            _agents[i] = make_agent(_configs[i])
+        agents[seat + 1] = _agents[i]
+    result = Engine(game, agents).play()
+    return {
+        "game": task.game_id, "seed": task.seed, "rotation": task.rotation, "seats": names,
+        "winner": names[result.winner - 1] if result.winner is not None else None,
+        "turns": len(result.turns), "seconds": round(result.seconds, 4),
+    }
+
+
+def header(configs: List[AgentConfig], nr_of_players: int, deals: int, seed: int) -> dict:
+    # first record of a results file, only a run with the same header resumes the file
+    return loads(dumps({"header": {
+        "configs": [config._asdict() for config in configs], "players": nr_of_players, "deals": deals, "seed": seed,
+    }}))
+
+
+def read_results(path: str) -> Tuple[dict, List[dict]]:
+    """
+    :return: header (None for a missing or empty file) and game records of path
+    """
+    if not os_path.exists(path):
+        return None, []
+    with open(path) as f:
+        records = [loads(line) for line in f if line.strip()]
+    return (records[0], records[1:]) if records else (None, [])
+
+
+def run(configs: List[AgentConfig], nr_of_players: int = 2, deals: int = 10, seed: int = 0,
+        path: str = RESULTS_PATH, workers: int = None, board_cls: Type[Board] = Board,
+        verbose: bool = False) -> List[dict]:
+    """
+    plays the schedule on a process pool, each record is appended to path as soon as its game is done
+    games already in path are not played again (resume of an interrupted run), path has to be from a run with the
+    same configs, nr_of_players, deals and seed
+    :return: records of all games of the schedule
+    """
+    if len(set(config.name for config in configs)) != len(configs):
+        raise ValueError("[!] Agent names have to be unique!")
+    if not 2 <= nr_of_players <= min(4, len(configs)):
+        raise ValueError(f"[!] Cannot play games of {nr_of_players} players with {len(configs)} agents!")
+
+    tasks = schedule(len(configs), nr_of_players, deals, seed)
+    expected = header(configs, nr_of_players, deals, seed)
+    found, games = read_results(path)
+    if found is not None and found != expected:
+        raise ValueError(f"[!] {path} holds the games of another tournament ({found}), use another file!")
+    records = {record["game"]: record for record in games}
+    todo = [task for task in tasks if task.game_id not in records]
+
+    with open(path, "a") as f, ProcessPoolExecutor(workers or cpu_count() or 1, initializer=_init_worker,
+                                                   initargs=(configs,)) as pool:
+        if found is None:
+            f.write(dumps(expected) + "\n")
+        pending = {pool.submit(play_task, task, board_cls) for task in todo}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                records[record["game"]] = record
+                f.write(dumps(record) + "\n")
+                f.flush()
+                if verbose:
+                    print(f"[*] {len(records)}/{len(tasks)} games, {' vs '.join(record['seats'])}: "
+                          f"{record['winner'] or 'no winner'}")
+    return [records[task.game_id] for task in tasks]
+
+
+def pairwise(records: List[dict]) -> List[Tuple[str, str, float]]:
+    """
+    the winner of a game beat every other player of it, all other pairs are draws
+    :return: (name, other name, score of name) per pair of players per game
+    """
+    pairs = []
+    for record in records:
+        for a, b in combinations(record["seats"], 2):
+            if record["winner"] == a:
+                pairs.append((a, b, 1.0))
+            elif record["winner"] == b:
+                pairs.append((a, b, 0.0))
+            else:
+                pairs.append((a, b, 0.5))
+    return pairs
+
+
+def fit_elo(names: List[str], pairs: List[Tuple[str, str, float]], iterations: int = 100) -> Dict[str, float]:
+    """
+    bradley terry fit (minorization maximization), with one virtual draw per pair of agents that met
+    -> finite ratings even for agents that never (or always) won
+    :return: elo per name, the mean is 0
+    """
+    index = {name: i for i, name in enumerate(names)}
+    n = len(names)
+    scores = [[0.0] * n for _ in range(n)]
+    games = [[0] * n for _ in range(n)]
+    for a, b, score in pairs:
+        i, j = index[a], index[b]
+        if not games[i][j]:
+            scores[i][j] += 0.5
+            scores[j][i] += 0.5
+            games[i][j] = games[j][i] = 1
+        scores[i][j] += score
+        scores[j][i] += 1 - score
+        games[i][j] += 1
+        games[j][i] += 1
+
+    gamma = [1.0] * n
+    for _ in range(iterations):
+        for i in range(n):
+            denominator = sum(games[i][j] / (gamma[i] + gamma[j]) for j in range(n) if games[i][j])
+            if denominator:
+                gamma[i] = sum(scores[i]) / denominator
+        mean = sum(log10(g) for g in gamma) / n
+        gamma = [g / 10 ** mean for g in gamma]
+    return {name: 400 * log10(gamma[index[name]]) for name in names}
+
+
+class Rating(NamedTuple):
+    games: int
+    win_rate: float
+    win_rate_error: float  # 95% confidence, normal approximation
+    elo: float
+    elo_low: float         # 95% confidence interval, bootstrap over the games
+    elo_high: float
+
+
+def ratings(names: List[str], records: List[dict], samples: int = 200, seed: int = 0) -> Dict[str, Rating]:
+    elo = fit_elo(names, pairwise(records))
+    rng = Random(seed)
+    sampled = {name: [] for name in names}
+    for _ in range(samples if records else 0):
+        resampled = [rng.choice(records) for _ in records]
+        for name, value in fit_elo(names, pairwise(resampled)).items():
+            sampled[name].append(value)
+
+    result = {}
+    for name in names:
+        played = [record for record in records if name in record["seats"]]
+        wins = sum(record["winner"] == name for record in played)
+        rate = wins / len(played) if played else 0.0
+        error = 1.96 * sqrt(rate * (1 - rate) / len(played)) if played else 0.0
+        values = sorted(sampled[name]) or [elo[name]]
+        low, high = values[int(0.025 * (len(values) - 1))], values[int(0.975 * (len(values) - 1))]
+        result[name] = Rating(len(played), rate, error, elo[name], low, high)
+    return result
+
+
+def main():
+    parser = ArgumentParser(description="round robin tournament of agents with elo ratings")
+    parser.add_argument("config", nargs="?", help="json file with a list of agent configs (name, kind, params, "
+                                                  "weights), maximax, greedy and search if not given")
+    parser.add_argument("--players", type=int, default=2, help="players per game")
+    parser.add_argument("--deals", type=int, default=10, help="decks per table, each played in every seat rotation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="processes, one per cpu if not given")
+    parser.add_argument("--out", default=RESULTS_PATH,
+                        help="jsonl file to append the games to (and resume from, with the same arguments)")
+    args = parser.parse_args()
+
+    if args.config:
+        with open(args.config) as f:
+            configs = [AgentConfig.from_dict(config) for config in load(f)]
+    else:
+        configs = DEFAULT_AGENTS
+    records = run(configs, args.players, args.deals, args.seed, args.out, args.workers, verbose=True)
+
+    names = [config.name for config in configs]
+    table = ratings(names, records)
+    print(f"[*] {'agent':<16} {'games':>6} {'win rate':>14} {'elo':>7}  95% interval")
+    for name in sorted(names, key=lambda name: -table[name].elo):
+        r = table[name]
+        print(f"[*] {name:<16} {r.games:>6} {r.win_rate:>7.1%} ±{r.win_rate_error:>5.1%} {r.elo:>7.0f}  "
+              f"[{r.elo_low:.0f}, {r.elo_high:.0f}]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from engine import Engine
+from heuristic import Weights, default_weights, save_weights
+from json import dump, load
+from os import cpu_count, path as os_path, replace
+from random import Random
+from tournament import AgentConfig, dealt_game, make_agent
+from typing import Dict, List, Tuple
+
+# weights that are tuned, invalid_play only marks the spots that cannot be played
+TUNED = [name for name in Weights._fields if name != "invalid_play"]
+
+CHECKPOINT_PATH = "tuner_checkpoint.json"
+WEIGHTS_PATH = "weights.json"
+
+
+def _play(kind: str, params: dict, weights: Tuple[Dict[str, float], Dict[str, float]], seed: int,
+          rotation: int) -> int:
+    """
+    runs in a worker: game of the agent of kind with weights[0] against the one with weights[1] on the decks of seed
+    :param rotation: index of the weights that place the first card
+    :return: 1 if weights[0] won, -1 if weights[1] won, 0 if nobody won
+    """
+    configs = [AgentConfig(str(i), kind, params, w) for i, w in enumerate(weights)]
+    seats = [rotation, 1 - rotation]
+    game = dealt_game([configs[i].name for i in seats], seed)
+    result = Engine(game, {seat + 1: make_agent(configs[i]) for seat, i in enumerate(seats)}).play()
+    if result.winner is None:
+        return 0
+    return 1 if seats[result.winner - 1] == 0 else -1
+
+
+class SPSA:
+    """
+    simultaneous perturbation stochastic approximation over self play: each iteration perturbs all weights at once
+    in a random direction, the match of the plus against the minus perturbation estimates the gradient
+    weights are tuned relative to their start values -> small and large weights move alike
+    weights keep the sign of their start values (0 counts as positive), e.g. evaluate needs win, in_row and own_sum
+    to be >= 0
+    """
+
+    def __init__(self, start: Weights = None, iterations: int = 100, deals: int = 8, a: float = 0.2, c: float = 0.2,
+                 kind: str = "greedy", params: dict = None, seed: int = 0):
+        """
+        :param start: the current H_* weights if None
+        :param deals: decks per iteration, each played with both seatings
+        :param a: step size of the first iteration, relative to the start values
+        :param c: perturbation of the first iteration, relative to the start values
+        :param kind: agent kind that plays the games, see tournament.AGENTS
+        """
+        start = start if start is not None else default_weights()
+        self.scale = {name: abs(getattr(start, name)) or 1.0 for name in TUNED}
+        self.theta = {name: getattr(start, name) / self.scale[name] for name in TUNED}
+        self.signs = {name: -1 if getattr(start, name) < 0 else 1 for name in TUNED}
+        self.fixed = {name: getattr(start, name) for name in Weights._fields if name not in TUNED}
+        self.iterations = iterations
+        self.stability = iterations / 10  # of the step sizes, stays the same if more iterations are run on resume
+        self.deals = deals
+        self.a = a
+        self.c = c
+        self.kind = kind
+        self.params = params or {}
+        self.seed = seed
+        self.iteration = 0
+        self.scores: List[float] = []  # per iteration: mean result of plus against minus
+
+    def to_weights(self, theta: Dict[str, float] = None) -> Dict[str, float]:
+        theta = theta if theta is not None else self.theta
+        return {**self.fixed, **{name: self.bound(name, theta[name]) * self.scale[name] for name in TUNED}}
+
+    def bound(self, name: str, value: float) -> float:
+        # value of theta with the sign of the start value, 0 if it crossed over
+        return max(value * self.signs[name], 0.0) * self.signs[name]
+
+    def weights(self) -> Weights:
+        # current estimate of the best weights
+        return Weights(**{name: round(value, 3) for name, value in self.to_weights().items()})
+
+    def step(self, pool: ProcessPoolExecutor) -> float:
+        """
+        plays the match of one iteration on pool and moves the weights
+        :return: mean result of the plus perturbation (1 win, -1 loss, 0 no winner)
+        """
+        k = self.iteration
+        a_k = self.a / (k + 1 + self.stability) ** 0.602
+        c_k = self.c / (k + 1) ** 0.101
+        rng = Random(self.seed * 1_000_003 + k)
+        delta = {name: rng.choice((-1, 1)) for name in TUNED}
+        plus = self.to_weights({name: self.theta[name] + c_k * delta[name] for name in TUNED})
+        minus = self.to_weights({name: self.theta[name] - c_k * delta[name] for name in TUNED})
+
+        tasks = [
+            pool.submit(_play, self.kind, self.params, (plus, minus), (self.seed * 1_000_003 + k) * 1_000 + deal,
+                        rotation)
+            for deal in range(self.deals) for rotation in (0, 1)
+        ]
+        score = sum(task.result() for task in tasks) / len(tasks)
+
+        for name in TUNED:
+            self.theta[name] = self.bound(name, self.theta[name] + a_k * score / (2 * c_k * delta[name]))
+        self.iteration += 1
+        self.scores.append(score)
+        return score
+
+    def save(self, path: str) -> None:
+        # written to a temporary file first -> a checkpoint is never half written
+        with open(path + ".tmp", "w") as f:
+            dump(self.__dict__, f, indent=2)
+        replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "SPSA":
+        spsa = cls.__new__(cls)
+        with open(path) as f:
+            spsa.__dict__.update(load(f))
+        return spsa
+
+
+def resume(path: str, iterations: int, deals: int, a: float, c: float, kind: str, seed: int) -> SPSA:
+    """
+    :param iterations: total iterations, the only setting that may differ from the checkpoint
+    :return: the SPSA of the checkpoint at path
+    """
+    spsa = SPSA.load(path)
+    given = {"deals": deals, "a": a, "c": c, "kind": kind, "seed": seed}
+    differ = [f"{name} {value} (checkpoint: {getattr(spsa, name)})" for name, value in given.items()
+              if getattr(spsa, name) != value]
+    if differ:
+        raise ValueError(f"[!] Arguments differ from the checkpoint {path}: {', '.join(differ)}!")
+    spsa.iterations = iterations
+    return spsa
+
+
+def tune(spsa: SPSA, workers: int = None, checkpoint: str = CHECKPOINT_PATH, verbose: bool = False) -> Weights:
+    """
+    runs the remaining iterations of spsa, a checkpoint is saved after every iteration
+    :return: the tuned weights
+    """
+    with ProcessPoolExecutor(workers or cpu_count() or 1) as pool:
+        while spsa.iteration < spsa.iterations:
+            score = spsa.step(pool)
+            spsa.save(checkpoint)
+            if verbose:
+                print(f"[*] Iteration {spsa.iteration}/{spsa.iterations}: {score:+.3f}")
+    return spsa.weights()
+
+
+def main():
+    parser = ArgumentParser(description="tunes the weights of the heuristic with SPSA over self play")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--deals", type=int, default=8, help="decks per iteration, each played with both seatings")
+    parser.add_argument("--kind", default="greedy", help="agent kind that plays the games (greedy, maximax, search)")
+    parser.add_argument("-a", type=float, default=0.2, help="first step size, relative to the weights")
+    parser.add_argument("-c", type=float, default=0.2, help="first perturbation, relative to the weights")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="processes, one per cpu if not given")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH,
+                        help="resumed from if it exists, with the same arguments except --iterations")
+    parser.add_argument("--out", default=WEIGHTS_PATH, help="json file for the tuned weights")
+    args = parser.parse_args()
+
+    if os_path.exists(args.checkpoint):
+        spsa = resume(args.checkpoint, args.iterations, args.deals, args.a, args.c, args.kind, args.seed)
+        print(f"[*] Resuming from iteration {spsa.iteration} of {args.checkpoint}")
+    else:
+        spsa = SPSA(iterations=args.iterations, deals=args.deals, a=args.a, c=args.c, kind=args.kind, seed=args.seed)
+
+    weights = tune(spsa, args.workers, args.checkpoint, verbose=True)
+    save_weights(args.out, weights)
+    print(f"[*] Weights written to {args.out}, load them with heuristic.load_weights")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+from punto import Board, Card, Game
+from time import perf_counter
+from typing import Tuple
+
+import numpy as np
+
+# flat cell index -> ids of lines through it (padded with -1), line id -> flat cell indices, see punto.LineIndex
+_index = Board.line_index
+LINE_CELLS = np.array([[y * Board.max_x + x for x, y in cells] for cells in _index.cells], dtype=np.int64)
+LINES_THROUGH = np.full((Board.max_x * Board.max_y, 16), -1, dtype=np.int64)
+for _y in range(Board.max_y):
+    for _x in range(Board.max_x):
+        _lines = _index.lines_through[_y][_x]
+        LINES_THROUGH[_y * Board.max_x + _x, :len(_lines)] = _lines
+
+# columns of BatchSimulator.borders, same order as Board.borders
+OB_X_MIN, OB_Y_MIN, OB_X_MAX, OB_Y_MAX, IB_X_MIN, IB_Y_MIN, IB_X_MAX, IB_Y_MAX = range(8)
+
+DECK_SIZE = 2 * (Card.max_val - Card.min_val + 1)
+
+
+class BatchSimulator:
+    """
+    n_games games of n_players players each, stored as numpy arrays and played in lock step
+    the rules are the same as Board.is_valid_play, Board.update_borders and Board.check_winner
+    players have the ids 1 .. n_players, player 1 places the first card of each game
+    if the current player of a game cannot play its card, the card is discarded
+    """
+
+    def __init__(self, n_games: int, n_players: int, seed: int = None):
+        self.n_games = n_games
+        self.n_players = n_players
+        self.rng = np.random.default_rng(seed)
+        self._games = np.arange(n_games)
+
+        shape = (n_games, Board.max_y, Board.max_x)
+        self.owner = np.zeros(shape, dtype=np.int8)
+        self.value = np.zeros(shape, dtype=np.int8)
+        self.borders = np.zeros((n_games, 8), dtype=np.int16)
+        self.decks = np.zeros((n_games, n_players, DECK_SIZE), dtype=np.int8)
+        self.cards_left = np.zeros((n_games, n_players), dtype=np.int16)
+        self.current = np.zeros(n_games, dtype=np.int16)  # index of the player to move
+        self.winner = np.zeros(n_games, dtype=np.int8)    # player id, 0 if no winner (yet)
+        self.done = np.zeros(n_games, dtype=bool)
+        self.reset()
+
+    def reset(self, games: np.ndarray = None) -> None:
+        """
+        :param games: bool mask of the games to start again, all if None
+        """
+        games = self._games if games is None else self._games[games]
+        n = len(games)
+
+        self.owner[games] = 0
+        self.value[games] = 0
+        self.borders[games] = (0, 0, Board.max_x - 1, Board.max_y - 1,
+                               Board.x_mid - 1, Board.y_mid - 1, Board.x_mid + 1, Board.y_mid + 1)
+
+        # shuffled decks, the last card is drawn first
+        deck = np.tile(np.arange(Card.min_val, Card.max_val + 1, dtype=np.int8), 2)
+        self.decks[games] = self.rng.permuted(np.broadcast_to(deck, (n, self.n_players, DECK_SIZE)), axis=2)
+        self.cards_left[games] = DECK_SIZE
+        self.winner[games] = 0
+        self.done[games] = False
+
+        # first card of player 1 in the middle, like Board.__init__ (without updating the borders)
+        self.current[games] = 0
+        self.cards_left[games, 0] -= 1
+        self._place(games, np.full(n, Board.x_mid), np.full(n, Board.y_mid))
+        self.current[games] = 1 % self.n_players
+
+    def current_cards(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: player id and value of the card the player to move of each game plays next (value 0 if none left)
+        """
+        left = self.cards_left[self._games, self.current]
+        values = self.decks[self._games, self.current, np.maximum(left - 1, 0)]
+        return self.current + 1, np.where(left > 0, values, 0)
+
+    def valid_mask(self) -> np.ndarray:
+        """
+        :return: bool array (n_games, max_y, max_x), valid spots for the next card of each game
+        """
+        _, values = self.current_cards()
+
+        # bigger than the card underneath
+        valid = values[:, None, None] > self.value
+
+        # within the inner border
+        ys = np.arange(Board.max_y)[None, :, None]
+        xs = np.arange(Board.max_x)[None, None, :]
+        b = self.borders[:, :, None, None]
+        valid &= (b[:, IB_X_MIN] <= xs) & (xs <= b[:, IB_X_MAX]) & (b[:, IB_Y_MIN] <= ys) & (ys <= b[:, IB_Y_MAX])
+
+        # adjacent to a card (or on top of one)
+        occupied = np.pad(self.value > 0, ((0, 0), (1, 1), (1, 1)))
+        adjacent = np.zeros_like(valid)
+        for dy in range(3):
+            for dx in range(3):
+                adjacent |= occupied[:, dy:dy + Board.max_y, dx:dx + Board.max_x]
+        valid &= adjacent
+
+        valid[self.done] = False
+        return valid
+
+    def random_actions(self, valid: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: x and y of a random valid spot per game (0, 0 if there is none)
+        """
+        valid = self.valid_mask() if valid is None else valid
+        noise = self.rng.random(valid.shape) * valid
+        flat = noise.reshape(self.n_games, -1).argmax(axis=1)
+        return flat % Board.max_x, flat // Board.max_x
+
+    def step(self, x: np.ndarray, y: np.ndarray, valid: np.ndarray = None) -> np.ndarray:
+        """
+        the player to move of every running game draws its card and plays it on x, y (or discards it if it has no
+        valid spot), invalid spots are not checked
+        :return: id of the player that won with this step per game, 0 if none
+        """
+        valid = self.valid_mask() if valid is None else valid
+        can_play = valid.reshape(self.n_games, -1).any(axis=1)
+        running = ~self.done
+
+        # draw card
+        drawing = self._games[running & (self.cards_left[self._games, self.current] > 0)]
+        self.cards_left[drawing, self.current[drawing]] -= 1
+
+        playing = self._games[running & can_play]
+        won = np.zeros(self.n_games, dtype=np.int8)
+        if len(playing):
+            won[playing] = self._place(playing, x[playing], y[playing])
+            self._update_borders(playing, x[playing], y[playing])
+
+        self.winner = np.where(won > 0, won, self.winner)
+        self.done |= (won > 0) | (self.cards_left.sum(axis=1) == 0)
+        self.current[running] = (self.current[running] + 1) % self.n_players
+        return won
+
+    def _place(self, games: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        # put the drawn card of the current player on x, y and return the winner (or 0)
+        player = self.current[games]
+        card = self.decks[games, player, self.cards_left[games, player]]
+        self.owner[games, y, x] = player + 1
+        self.value[games, y, x] = card
+
+        # all lines through x, y that belong to the player completely
+        lines = LINES_THROUGH[y * Board.max_x + x]
+        cells = LINE_CELLS[lines]
+        owners = self.owner.reshape(self.n_games, -1)[games[:, None, None], cells]
+        complete = ((owners == (player + 1)[:, None, None]).all(axis=2) & (lines >= 0)).any(axis=1)
+        return np.where(complete, player + 1, 0)
+
+    def _update_borders(self, games: np.ndarray, x: np.ndarray, y: np.ndarray) -> None:
+        # see Board.update_borders
+        b = self.borders[games]
+        b[:, OB_X_MIN] = np.maximum(b[:, OB_X_MIN], x + 1 - Board.max_size)
+        b[:, OB_Y_MIN] = np.maximum(b[:, OB_Y_MIN], y + 1 - Board.max_size)
+        b[:, OB_X_MAX] = np.minimum(b[:, OB_X_MAX], x - 1 + Board.max_size)
+        b[:, OB_Y_MAX] = np.minimum(b[:, OB_Y_MAX], y - 1 + Board.max_size)
+
+        for pos, inner, outer, step in [(x, IB_X_MIN, OB_X_MIN, -1), (y, IB_Y_MIN, OB_Y_MIN, -1)]:
+            grow = (pos == b[:, inner]) & (b[:, inner] > b[:, outer])
+            b[grow, inner] = pos[grow] + step
+        for pos, inner, outer, step in [(x, IB_X_MAX, OB_X_MAX, 1), (y, IB_Y_MAX, OB_Y_MAX, 1)]:
+            grow = (pos == b[:, inner]) & (b[:, inner] < b[:, outer])
+            b[grow, inner] = pos[grow] + step
+        self.borders[games] = b
+
+    def play_random(self) -> np.ndarray:
+        """
+        plays all running games to the end with random valid plays
+        :return: winner per game (0 for no winner)
+        """
+        while not self.done.all():
+            valid = self.valid_mask()
+            self.step(*self.random_actions(valid), valid)
+        return self.winner
+
+
+def _random_game(n_players: int) -> None:
+    # object based random game, same rules as BatchSimulator
+    game = Game([str(i) for i in range(n_players)])
+    while not game.is_done():
+        player = game.players[0]
+        card = player.get_next_card()
+        game.next_player()
+        actions = game.board.get_valid_plays(card)
+        if not actions:
+            continue
+        x, y = actions[np.random.randint(len(actions))]
+        game.board.play_card(card, x, y, False)
+        if game.board.check_winner(player, x, y):
+            return
+
+
+def benchmark(n_games: int = 1000, n_players: int = 2, seed: int = 0) -> Tuple[float, float]:
+    """
+    :return: random games per second of the batch simulator and of the object based game
+    """
+    start = perf_counter()
+    BatchSimulator(n_games, n_players, seed).play_random()
+    batch = n_games / (perf_counter() - start)
+
+    np.random.seed(seed)
+    n_object_games = max(n_games // 20, 1)
+    start = perf_counter()
+    for _ in range(n_object_games):
+        _random_game(n_players)
+    objects = n_object_games / (perf_counter() - start)
+    return batch, objects
+
+
+if __name__ == "__main__":
+    for players in range(2, 5):
+        batch_rate, object_rate = benchmark(n_players=players)
+        print(f"[*] {players} players: {batch_rate:.0f} games/s batched, {object_rate:.0f} games/s objects "
+              f"({batch_rate / object_rate:.1f}x)")